@@ -1,11 +1,22 @@
 "This module contains the class router"
 
+import os
+from collections import OrderedDict
 import numpy as np
+from mpi4py import MPI
+from mpi4py.util import dtlib
 
 NoneType = type(None)
 
 int32_limit = np.int64(2 ** 31 - 1)
 
+# Maximum number of persistent communication plans kept in a router
+max_cached_plans = 8
+
+# send_recv uses a single Alltoallv in communicators up to this size.
+# The choice must be the same in all ranks, since the exchange is collective.
+small_comm_size = 8
+
 class Router:
     """
     This class can be used to handle communication between ranks in a MPI communicator.
@@ -16,18 +27,35 @@ class Router:
     ----------
     comm : MPI communicator
         The MPI communicator that is used for the communication.
+    dtype : dtype, optional
+        Default data type used in send_recv when none is given.
+        If not set, the data type of the data that is sent is used.
+    node_aware : bool, optional
+        If True, send_recv exchanges the data between ranks in the same
+        node through shared memory and only uses messages between nodes.
+        Creating the node communicators is collective. Default is False.
 
     Attributes
     ----------
     comm : MPI communicator
         The MPI communicator that is used for the communication.
 
+    dtype : dtype
+        Default data type used in send_recv when none is given.
+
     destination_count : ndarray
         Specifies a buffer to see how many points I send to each rank
 
     source_count : ndarray
         Specifies a buffer to see how many points I recieve from each rank
 
+    node_comm : MPI communicator
+        Communicator with the ranks in the same node. Only if node_aware.
+
+    leader_comm : MPI communicator
+        Communicator with the first rank of each node. Only if node_aware.
+        It is MPI.COMM_NULL in the other ranks.
+
     Notes
     -----
     The data is always flattened before sending and recieved data is always flattened.
@@ -43,9 +71,12 @@ class Router:
     >>> rt = Router(comm)
     """
 
-    def __init__(self, comm):
+    def __init__(self, comm, dtype=None, node_aware=False):
 
         self.comm = comm
+        self.dtype = dtype
+        # MPI data types matching the numpy ones that have been used
+        self._mpi_types = {}
         # Specifies a buffer to see how many points I send to each rank
         self.destination_count = np.zeros((comm.Get_size()), dtype=np.int64)
         # Specifies a buffer to see how many points I recieve from each rank
@@ -53,6 +84,30 @@ class Router:
         # Displacements for all to all communication
         self.destination_displacement = np.zeros((comm.Get_size()), dtype=np.int64)
         self.source_displacement = np.zeros((comm.Get_size()), dtype=np.int64)
+        # Optional distributed graph communicator for sparse count exchanges
+        self._graph_comm = None
+        self._graph_destinations = None
+        self._graph_sources = None
+        # Persistent communication plans, least recently used first
+        self._plans = OrderedDict()
+        self._active_plan = None
+        # Last communication pattern used in send_recv
+        self._last_destination_count = None
+        self._last_source_count = None
+        self._last_sources = None
+        # Buffers for the exchange of counts in gathers
+        self._gather_sizes = None
+        self._gather_count = None
+        # Communicators to separate the traffic inside and between nodes
+        self.node_aware = node_aware
+        self.node_comm = None
+        self.leader_comm = None
+        self._shared_win = None
+        self._shared_win_bytes = 0
+        if node_aware:
+            self._set_node_comm(
+                comm.Split_type(MPI.COMM_TYPE_SHARED, key=comm.Get_rank())
+            )
 
     def transfer_data(self, comm_pattern, **kwargs):
         """
@@ -92,13 +147,17 @@ class Router:
 
         return router_factory[comm_pattern](**kwargs)
 
-    def send_recv(self, destination=None, data=None, dtype=None, tag=None):
+    def send_recv(
+        self, destination=None, data=None, dtype=None, tag=None, fixed_counts=False
+    ):
         """
         Sends data to specified destinations and recieves data from whoever sent.
 
         Typically, when a rank needs to send some data, it also needs to recieve some.
         In this method this is done by using non blocking communication.
         We note, however, that when the method returns, the data is already recieved.
+        In communicators with up to small_comm_size ranks, the data is instead
+        exchanged with a single Alltoallv collective.
 
         Parameters
         ----------
@@ -108,10 +167,17 @@ class Router:
             The data that will be sent. If it is a list,
             the data will be sent to the corresponding destination.
             if the data is an ndarray, the same data will be sent to all destinations.
-        dtype : dtype
+        dtype : dtype, optional
             The data type of the data that is sent.
+            If not given, the one set in the router or the one of the data is used.
         tag : int
             Tag used to identify the messages.
+            It is not used when the data is exchanged with Alltoallv.
+        fixed_counts : bool, optional
+            If True, the caller guarantees that no rank changed the amount of data
+            it sends to each destination since the last call, so the exchange of
+            the counts is skipped. All ranks must give the same value.
+            Default is False.
 
         Returns
         -------
@@ -120,6 +186,13 @@ class Router:
         recvbuff : list
             A list with the recieved data. The data is stored in the same order as the sources.
 
+        Notes
+        -----
+        When the data is exchanged with Alltoallv, i.e., in communicators
+        with up to small_comm_size ranks, the tag is ignored and the arrays
+        in recvbuff are views of one shared recieve buffer. They do not overlap,
+        but copy them if they must be independent arrays.
+
         Examples
         --------
         To send and recieve data between ranks, do the following:
@@ -137,6 +210,130 @@ class Router:
         >>>     recvbf[i] = recvbf[i].reshape((-1, 3))
         """
 
+        dtype = self._get_dtype(dtype, data)
+
+        # In small communicators the exchange is done in one collective
+        # instead of paying the latency of one message per rank
+        if (
+            self._graph_comm is None
+            and not self.node_aware
+            and self.comm.Get_size() <= small_comm_size
+        ):
+            sources = self._exchange_counts(destination, data, fixed_counts)
+            recvbuff = self._alltoallv_exchange(destination, data, dtype, sources)
+            return sources, recvbuff
+
+        # Prepare the send buffers while the counts are exchanged
+        countreq = self._start_count_exchange(destination, data, fixed_counts)
+        sendbufs = self._pack_send_buffers(destination, data, dtype)
+        sources = self._finish_count_exchange(countreq)
+
+        # Exchange the data inside the node through shared memory
+        if self.node_aware:
+            recvbuff = self._node_aware_send_recv(
+                destination, sendbufs, dtype, tag, sources
+            )
+            return sources, recvbuff
+
+        recvbuff, recvreq, sendreqs = self._post_send_recv(
+            destination, sendbufs, dtype, tag, sources
+        )
+
+        ## complete the send and recieve requests
+        MPI.Request.Waitall(recvreq)
+        MPI.Request.Waitall(sendreqs)
+
+        return sources, recvbuff
+
+    def send_recv_iter(
+        self, destination=None, data=None, dtype=None, tag=None, fixed_counts=False
+    ):
+        """
+        Sends data to specified destinations and yields the recieved data as it arrives.
+
+        This is the same as send_recv, but instead of waiting for all the
+        messages, the data from each source is given back as soon as it is
+        recieved. This allows to process some of the data while the rest of
+        the messages are still in transit.
+
+        Parameters
+        ----------
+        destination : list
+            A list with the rank ids that the data should be sent to.
+        data : list or ndarray
+            The data that will be sent. If it is a list,
+            the data will be sent to the corresponding destination.
+            if the data is an ndarray, the same data will be sent to all destinations.
+        dtype : dtype, optional
+            The data type of the data that is sent.
+            If not given, the one set in the router or the one of the data is used.
+        tag : int
+            Tag used to identify the messages.
+        fixed_counts : bool, optional
+            If True, the exchange of the counts is skipped, as in send_recv.
+            Default is False.
+
+        Yields
+        ------
+        source : int
+            The rank id that the data was recieved from.
+        recvbuff : ndarray
+            The recieved data.
+
+        Notes
+        -----
+        The generator must be consumed completely, otherwise the
+        communication is not finished.
+
+        Examples
+        --------
+        To process the data in the order it arrives, do the following:
+
+        >>> rt = Router(comm)
+        >>> for source, recvbf in rt.send_recv_iter(destination = destination,
+        >>>                       data = local_data, dtype=np.double, tag = 0):
+        >>>     recvbf = recvbf.reshape((-1, 3))
+        """
+
+        dtype = self._get_dtype(dtype, data)
+
+        # Prepare the send buffers while the counts are exchanged
+        countreq = self._start_count_exchange(destination, data, fixed_counts)
+        sendbufs = self._pack_send_buffers(destination, data, dtype)
+        sources = self._finish_count_exchange(countreq)
+
+        recvbuff, recvreq, sendreqs = self._post_send_recv(
+            destination, sendbufs, dtype, tag, sources
+        )
+
+        ## Give back the data as each recieve is completed
+        pending = len(recvreq)
+        while pending > 0:
+            source_ind = MPI.Request.Waitany(recvreq)
+            pending -= 1
+            yield sources[source_ind], recvbuff[source_ind]
+
+        MPI.Request.Waitall(sendreqs)
+
+    def _exchange_counts(self, destination, data, fixed_counts=False):
+        """
+        Fill the destination and source counts and return the ranks that send data to this one.
+        """
+
+        return self._finish_count_exchange(
+            self._start_count_exchange(destination, data, fixed_counts)
+        )
+
+    def _start_count_exchange(self, destination, data, fixed_counts=False):
+        """
+        Fill the destination count and start filling the source count.
+
+        The all to all exchange of the counts is non blocking, so other
+        work can be done before calling _finish_count_exchange.
+        The request is None if the source count is already filled.
+        If fixed_counts is set, the counts of the last exchange are reused.
+        """
+
         # ===========================
         # Fill the destination count
         # ===========================
@@ -154,13 +351,232 @@ class Router:
         # ======================
         # Fill the source count
         # ======================
+        if self._graph_comm is not None:
+            # Only exchange the counts with the neighbours in the graph
+            self.source_count[:] = 0
+            self._neighbor_count_exchange()
+            return None
+        if fixed_counts and not isinstance(self._last_destination_count, NoneType):
+            # The caller guarantees that no rank changed what it sends,
+            # so the counts are the same as before
+            if not np.array_equal(self.destination_count, self._last_destination_count):
+                raise ValueError(
+                    "fixed_counts was given, but the data sent to each rank changed since the last call"
+                )
+            self.source_count[:] = self._last_source_count
+            return None
+
         self.source_count[:] = 0
-        self.comm.Alltoall(sendbuf=self.destination_count, recvbuf=self.source_count)
-        sources = np.where(self.source_count != 0)[0]
+        return self.comm.Ialltoall(
+            sendbuf=self.destination_count, recvbuf=self.source_count
+        )
+
+    def _finish_count_exchange(self, countreq):
+        """
+        Complete the exchange of the counts and return the ranks that send data to this one.
+        """
+
+        if not isinstance(countreq, NoneType):
+            countreq.Wait()
+
+            # Keep the pattern to check if it changes in the next call
+            self._last_destination_count = self.destination_count.copy()
+            self._last_source_count = self.source_count.copy()
+            self._last_sources = np.where(self.source_count != 0)[0]
+            sources = self._last_sources
+        elif self._graph_comm is None:
+            sources = self._last_sources
+        else:
+            sources = np.where(self.source_count != 0)[0]
 
         # Check if any message is too large
         check_sendrecv_counts(self.comm, self.source_count)
 
+        return sources
+
+    def _pack_send_buffers(self, destination, data, dtype):
+        """
+        Get a flattened contiguous send buffer for each destination.
+
+        ravel only copies if the data is not contiguous
+        or if it is not of the data type that is sent.
+        """
+
+        if isinstance(data, list):
+            return [np.ascontiguousarray(d, dtype=dtype).ravel() for d in data]
+
+        # The same data goes to all destinations, so they share the buffer
+        sendbuf = np.ascontiguousarray(data, dtype=dtype).ravel()
+        return [sendbuf for _ in destination]
+
+    def _set_node_comm(self, node_comm):
+        """Set the communicator of the node and find which ranks share it"""
+
+        rank = self.comm.Get_rank()
+
+        self.node_comm = node_comm
+        if not isinstance(self._shared_win, NoneType):
+            self._shared_win.Free()
+        self._shared_win = None
+        self._shared_win_bytes = 0
+        is_leader = node_comm.Get_rank() == 0
+        self.leader_comm = self.comm.Split(
+            color=0 if is_leader else MPI.UNDEFINED, key=rank
+        )
+
+        # Identify each node by the rank of its leader
+        node_id = np.empty((1), dtype=np.int64)
+        node_id[0] = node_comm.bcast(rank, root=0)
+        rank_node = np.empty((self.comm.Get_size()), dtype=np.int64)
+        self.comm.Allgather(sendbuf=node_id, recvbuf=rank_node)
+        self._on_node = rank_node == node_id[0]
+
+        # Position in the node communicator of each rank in the node
+        self._node_ranks = np.empty((node_comm.Get_size()), dtype=np.int64)
+        my_rank = np.empty((1), dtype=np.int64)
+        my_rank[0] = rank
+        node_comm.Allgather(sendbuf=my_rank, recvbuf=self._node_ranks)
+        self._node_rank_of = np.full((self.comm.Get_size()), -1, dtype=np.int64)
+        self._node_rank_of[self._node_ranks] = np.arange(node_comm.Get_size())
+
+    def _node_aware_send_recv(self, destination, sendbufs, dtype, tag, sources):
+        """
+        Exchange the data with ranks in the same node through shared memory
+        and with the rest with point to point messages.
+        """
+
+        # Separate the ranks between those in this node and in other nodes
+        destination = np.asarray(destination, dtype=np.int64).reshape(-1)
+        intra_dest = self._on_node[destination]
+        intra_source = self._on_node[sources]
+        inter_destination = destination[~intra_dest]
+        inter_sendbufs = [sendbufs[i] for i in np.where(~intra_dest)[0]]
+
+        # Post the messages to other nodes
+        inter_recvbuff, recvreq, sendreqs = self._post_send_recv(
+            inter_destination, inter_sendbufs, dtype, tag, sources[~intra_source]
+        )
+
+        # Meanwhile, exchange the data in the node
+        intra_recvbuff = self._shared_memory_exchange(
+            destination, sendbufs, dtype, sources[intra_source]
+        )
+
+        MPI.Request.Waitall(recvreq)
+        MPI.Request.Waitall(sendreqs)
+
+        # Put the data in the order of the sources
+        inter_iter = iter(inter_recvbuff)
+        intra_iter = iter(intra_recvbuff)
+        recvbuff = [
+            next(intra_iter) if intra else next(inter_iter) for intra in intra_source
+        ]
+
+        return recvbuff
+
+    def _shared_memory_exchange(self, destination, sendbufs, dtype, sources):
+        """
+        Exchange data between ranks of the same node through a shared memory window.
+
+        Each rank writes the data it sends in its part of the window,
+        ordered by the rank in the node of the destination. The recievers
+        copy it from there.
+        """
+
+        node_size = self.node_comm.Get_size()
+        node_rank = self.node_comm.Get_rank()
+        itemsize = np.dtype(dtype).itemsize
+
+        # Everyone in the node needs all the counts to find the data in the window
+        node_send_count = np.where(
+            self._on_node[self._node_ranks], self.destination_count[self._node_ranks], 0
+        )
+        node_counts = np.empty((node_size, node_size), dtype=np.int64)
+        self.node_comm.Allgather(sendbuf=node_send_count, recvbuf=node_counts)
+        node_displacement = np.zeros((node_size, node_size), dtype=np.int64)
+        node_displacement[:, 1:] = np.cumsum(node_counts[:, :-1], axis=1)
+
+        # All ranks in the node must ask for the same size
+        max_count = int(np.max(np.sum(node_counts, axis=1)))
+        win = self._get_shared_window(max_count * itemsize)
+
+        # Write the data that goes to ranks in the node.
+        # Each message goes after the previous one in the segment of this rank
+        segment = np.frombuffer(
+            win.tomemory(), dtype=dtype, count=int(np.sum(node_send_count))
+        )
+        for dest_ind, dest in enumerate(destination):
+            if not self._on_node[dest]:
+                continue
+            dest_node_rank = self._node_rank_of[dest]
+            start = node_displacement[node_rank, dest_node_rank]
+            end = start + node_counts[node_rank, dest_node_rank]
+            segment[start:end] = sendbufs[dest_ind]
+        win.Fence()
+
+        # Copy the data that was written for this rank
+        recvbuff = []
+        for source in sources:
+            source_node_rank = self._node_rank_of[source]
+            buf, _ = win.Shared_query(source_node_rank)
+            source_segment = np.frombuffer(
+                buf, dtype=dtype, count=int(np.sum(node_counts[source_node_rank]))
+            )
+            start = node_displacement[source_node_rank, node_rank]
+            end = start + node_counts[source_node_rank, node_rank]
+            recvbuff.append(source_segment[start:end].copy())
+
+        # Do not write in the window again until everyone has read
+        win.Fence()
+
+        return recvbuff
+
+    def _get_shared_window(self, nbytes):
+        """
+        Get a shared memory window in the node with at least nbytes per rank.
+
+        The window is kept between calls and is only allocated again
+        when it needs to grow. This is collective in the node communicator
+        and all ranks in it must ask for the same size.
+        """
+
+        if nbytes > self._shared_win_bytes or isinstance(self._shared_win, NoneType):
+            if not isinstance(self._shared_win, NoneType):
+                self._shared_win.Free()
+            self._shared_win_bytes = max(nbytes, 2 * self._shared_win_bytes)
+            self._shared_win = MPI.Win.Allocate_shared(
+                self._shared_win_bytes, 1, comm=self.node_comm
+            )
+
+        return self._shared_win
+
+    def _get_dtype(self, dtype, data):
+        """Select the data type to use if none was given"""
+
+        if not isinstance(dtype, NoneType):
+            return dtype
+        if not isinstance(self.dtype, NoneType):
+            return self.dtype
+        if isinstance(data, list):
+            return data[0].dtype if len(data) > 0 else np.double
+        return data.dtype
+
+    def _get_mpi_type(self, dtype):
+        """Get the MPI data type that matches a numpy one. They are cached"""
+
+        char = np.dtype(dtype).char
+        if char not in self._mpi_types:
+            self._mpi_types[char] = dtlib.from_numpy_dtype(dtype)
+        return self._mpi_types[char]
+
+    def _post_send_recv(self, destination, sendbufs, dtype, tag, sources):
+        """
+        Allocate the recieve buffers and post the non blocking sends and recieves.
+
+        The caller must complete the requests and keep the send buffers
+        alive until then.
+        """
+
         # =========================
         # Allocate recieve buffers
         # =========================
@@ -172,29 +588,226 @@ class Router:
         # Send and recieve the data
         # =========================
 
+        # Give the buffers to MPI with explicit counts and data type
+        mpi_type = self._get_mpi_type(dtype)
+
         ## set up recieve request
         recvreq = [
-            self.comm.Irecv(recvbuff[source_ind], source=source, tag=tag)
+            self.comm.Irecv(
+                [recvbuff[source_ind], recvbuff[source_ind].size, mpi_type],
+                source=source,
+                tag=tag,
+            )
             for source_ind, source in enumerate(sources)
         ]
 
-        ## Set up and complete the send request
-        if isinstance(data, list):
-            # If it is a list, send matching position to destination
-            for dest_ind, dest in enumerate(destination):
-                sendreq = self.comm.Isend(data[dest_ind].flatten(), dest=dest, tag=tag)
-                sendreq.wait()
+        ## Set up the send request. Do not wait on each one individually,
+        ## all of them are completed later together with the recieves.
+        sendreqs = [
+            self.comm.Isend(
+                [sendbufs[dest_ind], sendbufs[dest_ind].size, mpi_type],
+                dest=dest,
+                tag=tag,
+            )
+            for dest_ind, dest in enumerate(destination)
+        ]
+
+        return recvbuff, recvreq, sendreqs
+
+    def set_graph(self, destinations=None, sources=None):
+        """
+        Set the communication graph used to exchange the counts in send_recv.
+
+        By default, send_recv exchanges the message sizes with an all to all
+        collective, which involves every rank in the communicator. If the
+        communication pattern is sparse and does not change, one can set the
+        graph once and only the neighbours will exchange the counts.
+
+        Parameters
+        ----------
+        destinations : list
+            A list with all the rank ids that this rank might send data to.
+            If None, the graph is removed and the all to all exchange is used.
+        sources : list, optional
+            A list with all the rank ids that might send data to this rank.
+            If not given, it is determined from the destinations of all ranks.
+
+        Notes
+        -----
+        This is a collective operation. After setting the graph, send_recv
+        can only send data to ranks in the destinations list.
+
+        Examples
+        --------
+        Set the graph once and reuse it in the communication:
+
+        >>> rt = Router(comm)
+        >>> destination = [(rank + 1) % size, (rank + 2) % size]
+        >>> rt.set_graph(destinations=destination)
+        >>> sources, recvbf = rt.send_recv(destination = destination,
+        >>>                   data = local_data, dtype=np.double, tag = 0)
+        """
+
+        if isinstance(destinations, NoneType):
+            self._graph_comm = None
+            self._graph_destinations = None
+            self._graph_sources = None
+            return
+
+        destinations = np.unique(np.asarray(destinations, dtype=np.int64))
+
+        if isinstance(sources, NoneType):
+            # Find out who will send to this rank
+            self.destination_count[:] = 0
+            self.destination_count[destinations] = 1
+            self.source_count[:] = 0
+            self.comm.Alltoall(
+                sendbuf=self.destination_count, recvbuf=self.source_count
+            )
+            sources = np.where(self.source_count != 0)[0]
+        sources = np.unique(np.asarray(sources, dtype=np.int64))
+
+        self._graph_destinations = destinations
+        self._graph_sources = sources
+        self._graph_comm = self.comm.Create_dist_graph_adjacent(
+            sources.tolist(), destinations.tolist(), reorder=False
+        )
+
+    def _neighbor_count_exchange(self):
+        """Exchange the send/recv counts only with the neighbours in the graph"""
+
+        # Check that all the data goes to ranks in the graph
+        sendcounts_edges = self.destination_count[self._graph_destinations]
+        if np.sum(sendcounts_edges) != np.sum(self.destination_count):
+            raise ValueError(
+                "Trying to send data to a rank that is not a destination in the graph. Update it with set_graph"
+            )
+
+        recvcounts_edges = np.zeros((len(self._graph_sources)), dtype=np.int64)
+        self._graph_comm.Neighbor_alltoall(sendcounts_edges, recvcounts_edges)
+        self.source_count[self._graph_sources] = recvcounts_edges
+
+    def plan(self, destination=None, sendbuf=None, source=None, recvbuf=None, tag=0):
+        """
+        Create persistent send and recieve requests for a fixed communication pattern.
+
+        When send_recv is called many times with the same destinations and
+        message sizes, the requests can be created once and then restarted
+        with send_recv_persistent. The data is always taken from and
+        written to the buffers given here.
+
+        Parameters
+        ----------
+        destination : list
+            A list with the rank ids that the data should be sent to.
+        sendbuf : list or ndarray
+            The contiguous buffers that will be sent. If it is a list,
+            each buffer is sent to the corresponding destination.
+            if it is an ndarray, the same buffer will be sent to all destinations.
+        source : list
+            A list with the rank ids that data is recieved from.
+        recvbuf : list
+            A list with contiguous buffers where the data from each source is recieved.
+            Their size must match what the source sends.
+        tag : int
+            Tag used to identify the messages.
+
+        Returns
+        -------
+        key : tuple
+            Identifier of the plan. It can be given to send_recv_persistent.
+            The last created plan is used by default.
+
+        Notes
+        -----
+        The plans are cached, so calling this method again with the same
+        buffers and pattern does not create new requests. Only the
+        max_cached_plans most recently created or used plans are kept.
+
+        Examples
+        --------
+        Obtain the sources and recieve buffers from a first exchange
+        and then reuse them:
+
+        >>> rt = Router(comm)
+        >>> sources, recvbf = rt.send_recv(destination = destination,
+        >>>                   data = local_data, dtype=np.double, tag = 0)
+        >>> rt.plan(destination = destination, sendbuf = local_data,
+        >>>         source = sources, recvbuf = recvbf, tag = 0)
+        >>> for i in range(0, 10):
+        >>>     local_data[:] = i
+        >>>     recvbf = rt.send_recv_persistent()
+        """
+
+        if isinstance(sendbuf, list):
+            sendbufs = sendbuf
         else:
-            # If it is not a list, send the same data to all destinations
-            for dest_ind, dest in enumerate(destination):
-                sendreq = self.comm.Isend(data.flatten(), dest=dest, tag=tag)
-                sendreq.wait()
+            sendbufs = [sendbuf for _ in destination]
+
+        for buf in sendbufs + list(recvbuf):
+            if not buf.flags.c_contiguous:
+                raise ValueError("Buffers used in persistent requests must be contiguous")
+
+        key = (
+            tuple(int(dest) for dest in destination),
+            tuple(int(src) for src in source),
+            tag,
+            tuple(
+                (buf.__array_interface__["data"][0], buf.size, buf.dtype.str)
+                for buf in sendbufs + list(recvbuf)
+            ),
+        )
 
-        ## complete the recieve request
-        for req in recvreq:
-            req.wait()
+        if key not in self._plans:
+            recvreqs = [
+                self.comm.Recv_init(recvbuf[source_ind], source=src, tag=tag)
+                for source_ind, src in enumerate(source)
+            ]
+            sendreqs = [
+                self.comm.Send_init(sendbufs[dest_ind], dest=dest, tag=tag)
+                for dest_ind, dest in enumerate(destination)
+            ]
+            self._plans[key] = (recvreqs + sendreqs, list(recvbuf), sendbufs)
 
-        return sources, recvbuff
+            # Free the least recently used plans
+            while len(self._plans) > max_cached_plans:
+                _, (old_reqs, _, _) = self._plans.popitem(last=False)
+                for req in old_reqs:
+                    req.Free()
+
+        self._plans.move_to_end(key)
+        self._active_plan = key
+
+        return key
+
+    def send_recv_persistent(self, key=None):
+        """
+        Sends and recieves data with the persistent requests created in plan.
+
+        Parameters
+        ----------
+        key : tuple, optional
+            The identifier returned by plan. If not given, the last plan is used.
+
+        Returns
+        -------
+        recvbuff : list
+            The recieve buffers given to plan, now holding the recieved data.
+        """
+
+        if isinstance(key, NoneType):
+            key = self._active_plan
+        if key not in self._plans:
+            raise ValueError("No communication plan found. Create one with plan")
+
+        reqs, recvbuff, _ = self._plans[key]
+        # Keep the plans that are used the longest in the cache
+        self._plans.move_to_end(key)
+
+        MPI.Prequest.Startall(reqs)
+        MPI.Request.Waitall(reqs)
+
+        return recvbuff
 
     def all_to_all(self, destination=None, data=None, dtype=None, **kwargs):
         """
@@ -241,29 +854,24 @@ class Router:
         >>>     recvbf[i] = recvbf[i].reshape((-1, 3))
         """
 
-        # ===========================
-        # Fill the destination count
-        # ===========================
+        # ======================================
+        # Fill the destination and source counts
+        # ======================================
+        sources = self._exchange_counts(destination, data)
 
-        self.destination_count[:] = 0
-        # Check if the data to send is a list
-        if isinstance(data, list):
-            # If it is a list, match each destination with its data
-            for dest_ind, dest in enumerate(destination):
-                self.destination_count[dest] = data[dest_ind].size
-        else:
-            # If it is not a list, send the same data to all destinations
-            self.destination_count[destination] = data.size
+        # =========================
+        # Send and recieve the data
+        # =========================
+        recvbuff = self._alltoallv_exchange(destination, data, dtype, sources)
 
-        # =====================
-        # Fill the source count
-        # =====================
-        self.source_count[:] = 0
-        self.comm.Alltoall(sendbuf=self.destination_count, recvbuf=self.source_count)
-        sources = np.where(self.source_count != 0)[0]
+        return sources, recvbuff
 
-        # Check if any message is too large
-        check_sendrecv_counts(self.comm, self.source_count)
+    def _alltoallv_exchange(self, destination, data, dtype, sources):
+        """
+        Exchange the data with a single Alltoallv collective.
+
+        The destination and source counts must already be filled.
+        """
 
         # ==============================
         # Allocate send and recv buffers
@@ -271,58 +879,52 @@ class Router:
         # ==============================
         if isinstance(data, list):
             # Create a send buffer that globally holds all
-            # the send counts for each destination
-            sendbuff = np.zeros((np.sum(self.destination_count)), dtype=dtype)
+            # the send counts for each destination.
+            # It is fully overwritten below
+            sendbuff = np.empty((np.sum(self.destination_count)), dtype=dtype)
         else:
             # If we are sending the same data everywhere, then no need to
             # duplicate the data. We will just set the dispalcements to 0
-            # later.
-            sendbuff = np.zeros((data.size), dtype=dtype)
-        recvbuff = np.zeros((np.sum(self.source_count)), dtype=dtype)
+            # later. The data is only copied if it is not contiguous
+            sendbuff = np.ascontiguousarray(data, dtype=dtype).ravel()
+        # It is fully overwritten by Alltoallv
+        recvbuff = np.empty((np.sum(self.source_count)), dtype=dtype)
 
         # ===========================
         # Calculate the dispaclements
         # ===========================
         if isinstance(data, list):
             # Check where the data for each rank starts in the global buffer
-            self.destination_displacement[:] = 0
-            for i in range(1, len(self.destination_displacement)):
-                self.destination_displacement[i] = (
-                    self.destination_displacement[i - 1] + self.destination_count[i - 1]
-                )
+            self.destination_displacement[0] = 0
+            np.cumsum(
+                self.destination_count[:-1], out=self.destination_displacement[1:]
+            )
         else:
             # The same data goes everywhere, so the displacement for all
             # destinations is 0
             self.destination_displacement[:] = 0
 
-        self.source_displacement[:] = 0
-        for i in range(1, len(self.source_displacement)):
-            self.source_displacement[i] = (
-                self.source_displacement[i - 1] + self.source_count[i - 1]
-            )
+        self.source_displacement[0] = 0
+        np.cumsum(self.source_count[:-1], out=self.source_displacement[1:])
 
         # ========================
         # Populate the send buffer
         # ========================
 
+        # If it is not a list, the same data goes to all destinations and
+        # it is already in the buffer, since we set the displacement to 0.
         if isinstance(data, list):
-            # If it is a list, send matching position to destination
+            # If it is a list, send matching position to destination.
+            # ravel gives a view, so each piece is only copied once
             for dest_ind, dest in enumerate(destination):
-                sendbuff[
-                    self.destination_displacement[dest] : self.destination_displacement[
-                        dest
-                    ]
-                    + data[dest_ind].size
-                ] = data[dest_ind].flatten()
-        else:
-            # If it is not a list, send the same data to all destinations.
-            # This one works like this since we set the displacement to 0.
-            sendbuff[:] = data.flatten()
+                start = self.destination_displacement[dest]
+                sendbuff[start : start + data[dest_ind].size] = np.ravel(
+                    data[dest_ind]
+                )
 
         # =========================
         # Send and recieve the data
         # =========================
-
         self.comm.Alltoallv(
             sendbuf=(sendbuff, (self.destination_count, self.destination_displacement)),
             recvbuf=(recvbuff, (self.source_count, self.source_displacement)),
@@ -340,7 +942,7 @@ class Router:
             for source in sources
         ]
 
-        return sources, recvbuff
+        return recvbuff
 
     def gather_in_root(self, data=None, root=0, dtype=None):
         """
@@ -356,6 +958,7 @@ class Router:
             The rank that will gather the data.
         dtype : dtype
             The data type of the data that is gathered.
+            If not given, the data is gathered as double.
 
         Returns
         -------
@@ -377,12 +980,15 @@ class Router:
 
         rank = self.comm.Get_rank()
 
-        # Populate the send buffer
-        sendbuff = np.zeros((data.size), dtype=dtype)
-        sendbuff[:] = data.flatten()
+        # The send and recieve buffers must have the same data type
+        if isinstance(dtype, NoneType):
+            dtype = np.double
+
+        # Populate the send buffer. Only copies if needed
+        sendbuff = np.ascontiguousarray(data, dtype=dtype).ravel()
 
-        # Collect local array sizes using the high-level mpi4py gather
-        sendcounts = np.array(self.comm.allgather(data.size), dtype=np.int64)
+        # Collect local array sizes
+        sendcounts = self._gather_counts(data.size)
         if rank == root:
             # print("sendcounts: {}, total: {}".format(sendcounts, np.sum(sendcounts)))
             recvbuf = np.empty(np.sum(sendcounts), dtype=dtype)
@@ -510,7 +1116,8 @@ class Router:
                 sendcounts = np.zeros((self.comm.Get_size()), dtype=np.int64)
                 sendcounts[:] = data.size // self.comm.Get_size()
 
-            sendbuf = data.flatten()
+            # Only copy the data if it is not contiguous
+            sendbuf = np.ascontiguousarray(data).ravel()
         else:
             sendbuf = None
 
@@ -518,7 +1125,10 @@ class Router:
         check_sendrecv_counts(self.comm, sendcounts)
 
         rank = self.comm.Get_rank()
-        recvbuf = np.ones(sendcounts[rank], dtype=dtype) * -100
+        recvbuf = np.empty(int(sendcounts[rank]), dtype=dtype)
+        if __debug__ and os.environ.get("PYSEMTOOLS_DEBUG_SCATTER"):
+            # Fill with a sentinel to spot entries that were not recieved
+            recvbuf.fill(-100)
 
         self.comm.Scatterv(sendbuf=(sendbuf, sendcounts), recvbuf=recvbuf, root=root)
 
@@ -563,8 +1173,8 @@ class Router:
             data = np.ones((1), dtype=dtype) * data
             count = 1
 
-        # Collect local array sizes using the high-level mpi4py gather
-        sendcounts = np.array(self.comm.allgather(count), dtype=np.int64)
+        # Collect local array sizes
+        sendcounts = self._gather_counts(count)
 
         # Check if any message is too large
         check_sendrecv_counts(self.comm, sendcounts)
@@ -575,6 +1185,23 @@ class Router:
 
         return recvbuf, sendcounts
 
+    def _gather_counts(self, count):
+        """
+        Gather the number of entries that each rank holds in all ranks.
+
+        The buffer-based Allgather avoids pickling the counts.
+        """
+
+        if isinstance(self._gather_sizes, NoneType):
+            self._gather_sizes = np.empty((self.comm.Get_size()), dtype=np.int64)
+            self._gather_count = np.empty((1), dtype=np.int64)
+
+        self._gather_count[0] = count
+        self.comm.Allgather(sendbuf=self._gather_count, recvbuf=self._gather_sizes)
+
+        # Give a copy, since the buffer is reused in the next call
+        return self._gather_sizes.copy()
+
 def check_sendrecv_counts(comm, sendrecv_count: np.ndarray):
 
     if np.any(sendrecv_count >= int32_limit):
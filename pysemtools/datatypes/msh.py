@@ -200,14 +200,14 @@ class Mesh:
         self.log.write("debug", "Performing MPI scan")
         # Find the element offset of each rank so you can store the global element number
         nelv = self.x.shape[0]
-        sendbuf = np.ones((1), np.int64) * nelv
+        sendbuf = np.array([nelv], dtype=np.int64)
         recvbuf = np.zeros((1), np.int64)
         comm.Scan(sendbuf, recvbuf)
         self.offset_el = recvbuf[0] - nelv
 
         self.log.write("debug", "Getting global number of elements")
         # Find the total number of elements
-        sendbuf = np.ones((1), np.int64) * self.nelv
+        sendbuf = np.array([self.nelv], dtype=np.int64)
         recvbuf = np.zeros((1), np.int64)
         comm.Allreduce(sendbuf, recvbuf)
         self.glb_nelv = recvbuf[0]
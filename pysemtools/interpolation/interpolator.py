@@ -80,7 +80,7 @@ class Interpolator:
 
         # Find the element offset of each rank so you can store the global element number
         nelv = self.x.shape[0]
-        sendbuf = np.ones((1), np.int64) * nelv
+        sendbuf = np.array([nelv], dtype=np.int64)
         recvbuf = np.zeros((1), np.int64)
         comm.Scan(sendbuf, recvbuf)
         self.offset_el = recvbuf[0] - nelv
@@ -0,0 +1,91 @@
+"""Compiled kernels used to interpolate fields in all elements of a sem mesh"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    numba_available = False
+else:
+    numba_available = True
+
+
+def interpolate_elements(lk, field, out, lk_t=None):
+    """
+    Apply a 1D interpolation operator in the r, s and t directions of each element.
+
+    Parameters
+    ----------
+    lk : ndarray
+        1D interpolation matrix of shape (n_new, n_old).
+    field : ndarray
+        Contiguous field of shape (nelv, n_old, n_old, n_old).
+        Indices are ordered as (element, t, s, r).
+    out : ndarray
+        Contiguous array of shape (nelv, n_new, n_new, n_new) where the result is written.
+    lk_t : ndarray, optional
+        Contiguous transpose of lk. It is computed if not given.
+
+    Notes
+    -----
+    If numba is available, the elements are processed in parallel by a compiled kernel.
+    Otherwise, the same operation is performed with numpy matrix products,
+    applying the operator one direction at a time (sum factorization).
+    """
+
+    if lk_t is None:
+        lk_t = np.ascontiguousarray(lk.T)
+
+    if numba_available:
+        _interpolate_elements_numba(lk, lk_t, field, out)
+    else:
+        _interpolate_elements_numpy(lk, lk_t, field, out)
+
+
+def _interpolate_elements_numpy(lk, lk_t, field, out):
+    """Apply the 1D operator in each direction with one matrix product per direction"""
+
+    nelv = field.shape[0]
+    n_old = field.shape[3]
+    n_new = lk.shape[0]
+
+    # Apply in r direction
+    tmp_r = field.reshape((nelv * n_old * n_old, n_old)) @ lk_t
+    tmp_r = tmp_r.reshape((nelv, n_old, n_old, n_new))
+
+    # Apply in s direction, broadcasting over elements and t
+    tmp_s = np.matmul(lk, tmp_r)
+
+    # Apply in t direction, writing directly in the output
+    np.matmul(
+        lk,
+        tmp_s.reshape((nelv, n_old, n_new * n_new)),
+        out=out.reshape((nelv, n_new, n_new * n_new)),
+    )
+
+
+if numba_available:
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _interpolate_elements_numba(lk, lk_t, field, out):
+        """Apply the 1D operator in each direction of the elements, one element per thread"""
+
+        nelv = field.shape[0]
+        n_old = field.shape[3]
+        n_new = lk.shape[0]
+
+        for e in prange(nelv):
+
+            # Apply in r direction
+            tmp_r = field[e].reshape((n_old * n_old, n_old)) @ lk_t
+            tmp_r = tmp_r.reshape((n_old, n_old, n_new))
+
+            # Apply in s direction
+            tmp_s = np.empty((n_old, n_new, n_new), dtype=out.dtype)
+            for k in range(n_old):
+                tmp_s[k] = lk @ tmp_r[k]
+
+            # Apply in t direction
+            out[e] = (lk @ tmp_s.reshape((n_old, n_new * n_new))).reshape(
+                (n_new, n_new, n_new)
+            )
@@ -16,6 +16,8 @@ class PRefiner:
 
         # Order of the element
         self.n = n_new
+        # Precision of the new mesh and fields.
+        # If None, the precision of the inputs is kept
         self.dtype = dtype
 
         # Initialize the element interpolators
@@ -43,26 +45,14 @@ class PRefiner:
         else:
             dtype = self.dtype
 
-        # Allocate the new coordinates
-        x = np.zeros((msh.nelv, self.lz, self.ly, self.lx), dtype=dtype)
-        y = np.zeros((msh.nelv, self.lz, self.ly, self.lx), dtype=dtype)
-        z = np.zeros((msh.nelv, self.lz, self.ly, self.lx), dtype=dtype)
-
-        # Loop over the elements and perform the interpolation
-        x_gll = self.ei_new.x_gll
-        y_gll = self.ei_new.x_gll
-        w_gll = self.ei_new.x_gll
-
-        for e in range(0, msh.nelv):
-            x[e, :, :, :] = self.ei_old.interpolate_field_at_rst_vector(
-                x_gll, y_gll, w_gll, msh.x[e, :, :, :]
-            )
-            y[e, :, :, :] = self.ei_old.interpolate_field_at_rst_vector(
-                x_gll, y_gll, w_gll, msh.y[e, :, :, :]
-            )
-            z[e, :, :, :] = self.ei_old.interpolate_field_at_rst_vector(
-                x_gll, y_gll, w_gll, msh.z[e, :, :, :]
-            )
+        # Perform the interpolation of all coordinates and elements at once.
+        # The new coordinates are views of the result, no need to allocate them
+        xyz = self._interpolate_elements(
+            np.stack((msh.x, msh.y, msh.z), axis=0), dtype=dtype
+        )
+        x = xyz[0]
+        y = xyz[1]
+        z = xyz[2]
 
         # Create the msh object
         new_msh = Mesh(comm, x=x, y=y, z=z)
@@ -108,31 +98,25 @@ class PRefiner:
         else:
             dtype = self.dtype
 
-        # Allocate the result of the interpolation
-        interpolated_fields = []
-        for _ in range(0, number_of_fields):
-            interpolated_fields.append(
-                np.zeros((self.nelv, self.lz, self.ly, self.lx), dtype=dtype)
-            )
-
-        # Get the RST coordinates of the new points
-        x_gll = self.ei_new.x_gll
-        y_gll = self.ei_new.x_gll
-        w_gll = self.ei_new.x_gll
+        # Interpolate all the fields at once. The result is one contiguous array
+        interpolated_fields = self._interpolate_elements(
+            np.stack(field_list, axis=0), dtype=dtype
+        )
 
-        ff = 0
-        for field in field_list:
+        # Give back a list of views, one per field
+        return [interpolated_fields[ff] for ff in range(0, number_of_fields)]
 
-            for e in range(0, self.nelv):
-                interpolated_fields[ff][e, :, :, :] = (
-                    self.ei_old.interpolate_field_at_rst_vector(
-                        x_gll, y_gll, w_gll, field[e, :, :, :]
-                    )
-                )
+    def _interpolate_elements(self, field, dtype=np.double):
+        """Interpolate fields in all elements at once with a tensor contraction.
 
-            ff += 1
+        The last three axes of the field are the t, s, r directions of the elements.
+        Any leading axes (elements, fields) are processed in the same operation.
+        The operation is performed in the given dtype, so single precision
+        fields are not promoted to double."""
 
-        return interpolated_fields
+        return self.ei_old.interpolate_field_at_nodes(
+            self.ei_new.x_gll, field, dtype=dtype
+        )
 
 
 class PMapper:
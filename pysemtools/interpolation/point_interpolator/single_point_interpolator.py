@@ -8,6 +8,7 @@ from .single_point_helper_functions import (
     lag_interp_matrix_at_xtest,
     get_reference_element,
 )
+from ..kernels import interpolate_elements
 
 NoneType = type(None)
 
@@ -50,6 +51,9 @@ class SinglePointInterpolator(ABC):
         # If interpolate_field_at_rst_vector() happened once
         self.if_interpolated_vector = False
 
+        # 1D interpolation matrices to sets of nodes, keyed by the nodes and dtype
+        self._nodes_interp_matrices = {}
+
     def find_rst_from_xyz(
         self, xj, yj, zj, tol=np.finfo(np.double).eps * 10, max_iterations=50
     ):
@@ -164,6 +168,79 @@ class SinglePointInterpolator(ABC):
 
         return field_at_rst
 
+    def get_interp_matrix_at_nodes(self, nodes, dtype=np.double):
+        """
+        Get the 1D interpolation matrix from the element nodes to the given nodes.
+
+        The matrix is computed once per set of nodes and data type.
+
+        Parameters
+        ----------
+        nodes : ndarray
+            1D array with the nodes in the reference element.
+        dtype : dtype
+            Data type of the matrix.
+
+        Returns
+        -------
+        tuple of ndarray
+            Contiguous matrix of shape (nodes.size, n) and its contiguous transpose.
+        """
+
+        nodes = np.asarray(nodes, dtype=np.double).reshape(-1)
+        dtype = np.dtype(dtype)
+        key = (nodes.tobytes(), dtype)
+        if key not in self._nodes_interp_matrices:
+            lk = np.ascontiguousarray(
+                lag_interp_matrix_at_xtest(self.x_gll, nodes).T, dtype=dtype
+            )
+            self._nodes_interp_matrices[key] = (lk, np.ascontiguousarray(lk.T))
+
+        return self._nodes_interp_matrices[key]
+
+    def interpolate_field_at_nodes(self, nodes, field, dtype=None):
+        """
+        Interpolate fields in elements to a tensor product of the given nodes.
+
+        The same 1D nodes are used in the r, s and t directions.
+
+        Parameters
+        ----------
+        nodes : ndarray
+            1D array with the nodes in the reference element.
+        field : ndarray
+            Field of shape (..., n, n, n). The last three axes are the t, s, r
+            directions of the elements. Leading axes (elements, fields) are
+            processed in the same operation.
+        dtype : dtype, optional
+            Data type used for the operation and the result.
+            If None, the data type of the field is kept.
+
+        Returns
+        -------
+        ndarray
+            Field of shape (..., nodes.size, nodes.size, nodes.size).
+        """
+
+        if isinstance(dtype, NoneType):
+            dtype = np.asarray(field).dtype
+
+        lk, lk_t = self.get_interp_matrix_at_nodes(nodes, dtype=dtype)
+        field = np.ascontiguousarray(field, dtype=dtype)
+
+        # Apply the matrix in the r, s and t directions of each element
+        n_old = field.shape[-1]
+        n_new = lk.shape[0]
+        out = np.empty(field.shape[:-3] + (n_new, n_new, n_new), dtype=dtype)
+        interpolate_elements(
+            lk,
+            field.reshape((-1, n_old, n_old, n_old)),
+            out.reshape((-1, n_new, n_new, n_new)),
+            lk_t=lk_t,
+        )
+
+        return out
+
     def find_rst(self, probes_info, mesh_info, settings, buffers=None):
         """Find rst from probes list. Include logic for iterations"""
         # Parse the inputs
@@ -0,0 +1,60 @@
+"""Compiled kernels used to unpack the data read from fld files"""
+
+try:
+    from numba import njit, prange
+except ImportError:
+    numba_available = False
+else:
+    numba_available = True
+
+
+def unpack_element_fields(buff, field, first):
+    """
+    Copy variables read from a fld file into an array that holds all the variables.
+
+    Parameters
+    ----------
+    buff : ndarray
+        Contiguous buffer with nvar variables of each element, one after the other,
+        as they are stored in the file.
+    field : ndarray
+        Contiguous array of shape (nelv, nvars, lz, ly, lx) where the data is copied.
+    first : int
+        Index of the first variable of field that is copied.
+
+    Notes
+    -----
+    The data is converted to the precision of field.
+    If numba is available, the elements are copied in parallel by a compiled kernel.
+    Otherwise, the same copy is performed with numpy.
+    """
+
+    nelv = field.shape[0]
+    lxyz = field.shape[2] * field.shape[3] * field.shape[4]
+    nvar = buff.size // max(nelv * lxyz, 1)
+
+    if numba_available and field.flags.c_contiguous:
+        _unpack_element_fields_numba(
+            buff.reshape((nelv, nvar, lxyz)),
+            field.reshape((nelv, field.shape[1], lxyz)),
+            first,
+        )
+    else:
+        dest = field[:, first : first + nvar]
+        dest[...] = buff.reshape(dest.shape)
+
+
+if numba_available:
+
+    @njit(parallel=True, cache=True)
+    def _unpack_element_fields_numba(buff, field, first):
+        """Copy the variables of the elements, one element per thread"""
+
+        nelv = buff.shape[0]
+        nvar = buff.shape[1]
+        lxyz = buff.shape[2]
+
+        for e in prange(nelv):
+            for v in range(nvar):
+                for i in range(lxyz):
+                    field[e, first + v, i] = buff[e, v, i]
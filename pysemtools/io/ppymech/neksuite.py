@@ -6,18 +6,46 @@ import numpy as np
 from pymech.neksuite.field import read_header
 from pymech.core import HexaData
 from pymech.neksuite.field import Header
+from .kernels import unpack_element_fields
 from .parallel_io import (
+    fld_file_iread,
+    fld_file_iread_into_elements,
     fld_file_read_vector_field,
     fld_file_read_field,
     fld_file_write_vector_field,
     fld_file_write_field,
+    fld_file_write_element_fields,
+    fld_file_read_fields,
+    fld_file_write_fields,
     fld_file_write_vector_metadata,
     fld_file_write_metadata,
+    fld_file_vector_metadata,
+    fld_file_metadata,
+    fld_file_write_metadata_buffer,
 )
 from ...monitoring.logger import Logger
 
 # from memory_profiler import profile
 
+# Sizes in bytes of the MPI types in the files. They do not change,
+# so they are queried only once
+mpi_int_size = MPI.INT.Get_size()
+mpi_real_size = MPI.REAL.Get_size()
+# mpi_double_size = MPI.DOUBLE.Get_size()
+mpi_character_size = MPI.CHARACTER.Get_size()
+
+# MPI-IO hints used when opening fld files. Unknown hints are ignored by MPI,
+# so file system specific ones (e.g. "striping_factor" and "striping_unit"
+# for lustre, only used when a file is created) can be added here.
+read_hints = {
+    "romio_cb_read": "enable",
+    "cb_buffer_size": "16777216",
+}
+write_hints = {
+    "romio_cb_write": "enable",
+    "cb_buffer_size": "16777216",
+}
+
 
 class IoHelper:
     """
@@ -31,6 +59,14 @@ class IoHelper:
     def __init__(self, h, pynek_dtype=np.double):
 
         self.fld_data_size = np.int64(h.wdsz)
+        # Precision of the data in the file
+        if self.fld_data_size == 4:
+            self.file_dtype = np.single
+        else:
+            self.file_dtype = np.double
+        # The data is in the byte order of this machine unless the
+        # test pattern of the file shows otherwise
+        self.byteswap = False
         self.pynek_dtype = pynek_dtype
         self.lx = np.int64(h.orders[0])
         self.ly = np.int64(h.orders[1])
@@ -64,6 +100,7 @@ class IoHelper:
         self.tmp_dp_vector = None
         self.tmp_sp_field = None
         self.tmp_dp_field = None
+        self.scratch_vector = None
 
     def element_mapping(self, comm):
         """
@@ -104,17 +141,10 @@ class IoHelper:
         self.m = self.glb_nelv
         self.pe_rank = np.int64(comm.Get_rank())
         self.pe_size = np.int64(comm.Get_size())
-        self.l = np.floor(np.double(self.m) / np.double(self.pe_size))
-        self.r = np.mod(self.m, self.pe_size)
-        self.ip = np.floor(
-            (
-                np.double(self.m)
-                + np.double(self.pe_size)
-                - np.double(self.pe_rank)
-                - np.double(1)
-            )
-            / np.double(self.pe_size)
-        )
+        # Integer divisions give the same result as flooring the division
+        self.l = self.m // self.pe_size
+        self.r = self.m % self.pe_size
+        self.ip = (self.m + self.pe_size - self.pe_rank - 1) // self.pe_size
 
         self.nelv = np.int64(self.ip)
         self.offset_el = np.int64(self.pe_rank * self.l + min(self.pe_rank, self.r))
@@ -166,70 +196,176 @@ class IoHelper:
         self.nelv = self.glb_nelv
         self.n = self.lxyz * self.nelv
 
-        # do a running sum
-        sendbuf = np.ones((1), np.int64) * self.nelv
-        recvbuf = np.zeros((1), np.int64)
-        comm.Scan(sendbuf, recvbuf)
-        self.offset_el = recvbuf[0] - self.nelv
-
-        # Later on, update this to an mpi reduction,
-        sendbuf = np.ones((1), np.int64) * self.nelv
-        recvbuf = np.zeros((1), np.int64)
-        comm.Allreduce(sendbuf, recvbuf)
-        self.glb_nelv = recvbuf[0]
+        # Gather the number of elements of all ranks. The offset and the
+        # global number of elements follow from it without more collectives
+        sendbuf = np.array([self.nelv], dtype=np.int64)
+        recvbuf = np.zeros((comm.Get_size()), np.int64)
+        comm.Allgather(sendbuf, recvbuf)
+        self.offset_el = np.int64(np.sum(recvbuf[: comm.Get_rank()]))
+        self.glb_nelv = np.int64(np.sum(recvbuf))
 
     def allocate_temporal_arrays(self):
         """'Allocate temporal arrays for reading and writing fields"""
+        # They are always filled before being used, so they are not initialized
         if self.fld_data_size == 4:
-            self.tmp_sp_vector = np.zeros(self.gdim * self.n, dtype=np.single)
-            self.tmp_sp_field = np.zeros(self.n, dtype=np.single)
+            self.tmp_sp_vector = np.empty(self.gdim * self.n, dtype=np.single)
+            self.tmp_sp_field = np.empty(self.n, dtype=np.single)
         elif self.fld_data_size == 8:
-            self.tmp_dp_vector = np.zeros(self.gdim * self.n, dtype=np.double)
-            self.tmp_dp_field = np.zeros(self.n, dtype=np.double)
+            self.tmp_dp_vector = np.empty(self.gdim * self.n, dtype=np.double)
+            self.tmp_dp_field = np.empty(self.n, dtype=np.double)
 
+    def get_scratch_field(self, component, dtype):
+        """Get a scratch array of shape (nelv, lz, ly, lx) to gather a field.
 
-# @profile
-def preadnek(filename, comm, data_dtype=np.double):
+        The arrays are components of one buffer that is allocated once and
+        reused for all fields. They are not initialized.
+
+        Parameters
+        ----------
+        component : int
+            Component of the buffer, from 0 to 2.
+        dtype : dtype
+            Data type of the array.
+
+        Returns
+        -------
+        ndarray
+            Contiguous view of the buffer.
+        """
+        if (
+            isinstance(self.scratch_vector, type(None))
+            or self.scratch_vector.dtype != dtype
+        ):
+            self.scratch_vector = np.empty(
+                (3, self.nelv, self.lz, self.ly, self.lx), dtype=dtype
+            )
+        return self.scratch_vector[component]
+
+
+def get_io_info(hints):
+    """Create an MPI info object with the given MPI-IO hints.
+
+    :meta private:
     """
-    Read and fld file and return a pymech hexadata object (Parallel).
 
-    Main function for readinf nek type fld filed.
+    info = MPI.Info.Create()
+    for key, value in hints.items():
+        info.Set(key, str(value))
 
-    Parameters
-    ----------
-    filename : str
-        The filename of the fld file.
+    return info
 
-    comm : Comm
-        MPI communicator.
 
-    data_dtype : str
-        The data type of the data in the file. (Default value = "float64").
+def check_byteswap(test_pattern):
+    """Check from the test pattern of a file if its data must be byte swapped.
 
-    Returns
-    -------
-    HexaData
-        The data read from the file in a pymech hexadata object.
+    :meta private:
+    """
 
-    Examples
-    --------
-    >>> from mpi4py import MPI
-    >>> from pysemtools.io.ppymech.neksuite import preadnek
-    >>> comm = MPI.COMM_WORLD
-    >>> data = preadnek('field00001.fld', comm)
+    if np.isclose(test_pattern[0], 6.54321):
+        return False
+    elif np.isclose(test_pattern.byteswap()[0], 6.54321):
+        return True
+    else:
+        raise ValueError("Could not interpret the endianness of the file")
+
+
+def gather_element_vector(data, key, ioh):
+    """Gather the components of a vector field of all elements in scratch arrays.
+
+    :meta private:
     """
-    log = Logger(comm=comm, module_name="preadnek")
-    log.tic()
-    log.write("info", "Reading file: {}".format(filename))
 
-    mpi_int_size = MPI.INT.Get_size()
-    mpi_real_size = MPI.REAL.Get_size()
-    # mpi_double_size = MPI.DOUBLE.Get_size()
-    mpi_character_size = MPI.CHARACTER.Get_size()
+    # Gather in the precision of the file, the data is converted anyway
+    x = ioh.get_scratch_field(0, ioh.file_dtype)
+    y = ioh.get_scratch_field(1, ioh.file_dtype)
+    z = ioh.get_scratch_field(2, ioh.file_dtype)
+    for e in range(0, ioh.nelv):
+        field = getattr(data.elem[e], key)
+        x[e, :, :, :] = field[0, :, :, :]
+        y[e, :, :, :] = field[1, :, :, :]
+        z[e, :, :, :] = field[2, :, :, :]
+
+    return x, y, z
+
+
+def gather_element_field(data, key, index, ioh):
+    """Gather one variable of a field of all elements in a scratch array.
+
+    :meta private:
+    """
+
+    # Gather in the precision of the file, the data is converted anyway
+    x = ioh.get_scratch_field(0, ioh.file_dtype)
+    for e in range(0, ioh.nelv):
+        x[e, :, :, :] = getattr(data.elem[e], key)[index, :, :, :]
+
+    return x
+
+
+def element_metadata(data, key, nvar, ioh):
+    """Compute the minimum and maximum of the variables of a field in each element.
+
+    Only the first nvar variables are used. The values are reduced directly
+    from the elements, so the field is not gathered. The result has shape
+    (nelv, nvar, 2) in single precision, which is the layout of the metadata
+    of the field in the file.
+
+    :meta private:
+    """
+
+    buff = np.zeros((ioh.nelv, nvar, 2), dtype=np.single)
+    for e in range(0, ioh.nelv):
+        field = getattr(data.elem[e], key)[:nvar].reshape(nvar, -1)
+        buff[e, :, 0] = np.min(field, axis=1)
+        buff[e, :, 1] = np.max(field, axis=1)
+
+    return buff
+
+
+def elements_in_file_precision(data, keys, ioh, comm):
+    """Check which fields of all elements can be written to a file as they are stored.
+
+    This is the case if the arrays are contiguous and in the precision of the file.
+    The result is the same in all ranks, so all of them write in the same way.
+
+    :meta private:
+    """
+
+    file_dtype = ioh.file_dtype
+
+    in_place = np.ones((len(keys)), dtype=np.intc)
+    for i, key in enumerate(keys):
+        for e in range(0, ioh.nelv):
+            field = getattr(data.elem[e], key)
+            if field.dtype != file_dtype or not field.flags.c_contiguous:
+                in_place[i] = 0
+                break
+
+    comm.Allreduce(MPI.IN_PLACE, in_place, op=MPI.MIN)
+
+    return {key: bool(in_place[i]) for i, key in enumerate(keys)}
+
+
+def read_fld_fields(filename, comm, data_dtype, log, info=None):
+    """Read all the fields of this rank from a fld file into contiguous arrays.
+
+    Each field is an array of shape (nelv, nvars, lz, ly, lx), so the fields
+    of one element are views of it. If no MPI info object is given, one with
+    the default read hints is created for this file.
+
+    :meta private:
+    """
 
     # Read the header
     header = read_header(filename)
 
+    # Keep the precision of the file if requested
+    if isinstance(data_dtype, type(None)):
+        if header.wdsz == 4:
+            data_dtype = np.single
+        else:
+            data_dtype = np.double
+
     # Initialize the io helper
     ioh = IoHelper(header, pynek_dtype=data_dtype)
 
@@ -237,120 +373,222 @@ def preadnek(filename, comm, data_dtype=np.double):
     # ioh.element_mapping(comm)
     ioh.element_mapping_load_balanced_linear(comm)
 
-    # allocate temporal arrays
-    log.write("debug", "Allocating temporal arrays")
-    ioh.allocate_temporal_arrays()
-
-    # Create the pymech hexadata object
-    log.write("debug", "Creating HexaData object")
-    data = HexaData(
-        header.nb_dims, ioh.nelv, header.orders, header.nb_vars, 0, dtype=data_dtype
-    )
-    data.time = header.time
-    data.istep = header.istep
-    data.wdsz = header.wdsz
-    data.endian = sys.byteorder
-
     # Open the file
-    fh = MPI.File.Open(comm, filename, MPI.MODE_RDONLY)
+    if isinstance(info, type(None)):
+        file_info = get_io_info(read_hints)
+    else:
+        file_info = info
+    fh = MPI.File.Open(comm, filename, MPI.MODE_RDONLY, info=file_info)
+    if isinstance(info, type(None)):
+        file_info.Free()
 
     # Read the test pattern
     mpi_offset = np.int64(132 * mpi_character_size)
+    # Only one rank reads it, the rest get it from there
     test_pattern = np.zeros(1, dtype=np.single)
-    fh.Read_at_all(mpi_offset, test_pattern, status=None)
+    if comm.Get_rank() == 0:
+        fh.Read_at(mpi_offset, test_pattern, status=None)
+    comm.Bcast(test_pattern, root=0)
+    ioh.byteswap = check_byteswap(test_pattern)
 
     # Read the indices?
     mpi_offset += mpi_real_size
-    idx = np.zeros(ioh.nelv, dtype=np.int32)
+    idx = np.empty(ioh.nelv, dtype=np.int32)
     byte_offset = mpi_offset + ioh.offset_el * mpi_int_size
     fh.Read_at_all(byte_offset, idx, status=None)
-    data.elmap = idx
+    if ioh.byteswap:
+        idx.byteswap(inplace=True)
     mpi_offset += ioh.glb_nelv * mpi_int_size
 
-    # Read the coordinates
+    # Allocate the arrays that hold each field for all elements.
+    # The elements are views of them, and each read is listed with its log
+    # message, destination array, first variable, number of variables
+    # and position in the file
+    reads = []
     if ioh.pos_variables > 0:
+        # Coordinates that are not in the file (2D) are zero
+        pos = np.zeros((ioh.nelv, 3, ioh.lz, ioh.ly, ioh.lx), dtype=data_dtype)
         byte_offset = (
             mpi_offset + ioh.offset_el * ioh.gdim * ioh.lxyz * ioh.fld_data_size
         )
-        log.write("debug", "Reading coordinate data")
-        x = np.zeros(ioh.nelv * ioh.lxyz, dtype=ioh.pynek_dtype)
-        y = np.zeros(ioh.nelv * ioh.lxyz, dtype=ioh.pynek_dtype)
-        z = np.zeros(ioh.nelv * ioh.lxyz, dtype=ioh.pynek_dtype)
-        fld_file_read_vector_field(fh, byte_offset, ioh, x=x, y=y, z=z)
-        for e in range(0, ioh.nelv):
-            data.elem[e].pos[0, :, :, :] = x[e, :, :, :].copy()
-            data.elem[e].pos[1, :, :, :] = y[e, :, :, :].copy()
-            data.elem[e].pos[2, :, :, :] = z[e, :, :, :].copy()
+        reads.append(("Reading coordinate data", pos, 0, ioh.gdim, byte_offset))
         mpi_offset += ioh.glb_nelv * ioh.gdim * ioh.lxyz * ioh.fld_data_size
 
-    # Read the velocity
     if ioh.vel_variables > 0:
+        vel = np.zeros((ioh.nelv, 3, ioh.lz, ioh.ly, ioh.lx), dtype=data_dtype)
         byte_offset = (
             mpi_offset + ioh.offset_el * ioh.gdim * ioh.lxyz * ioh.fld_data_size
         )
-
-        log.write("debug", "Reading velocity data")
-        if "x" not in locals():
-            x = np.zeros(ioh.nelv * ioh.lxyz, dtype=ioh.pynek_dtype)
-        if "y" not in locals():
-            y = np.zeros(ioh.nelv * ioh.lxyz, dtype=ioh.pynek_dtype)
-        if "z" not in locals():
-            z = np.zeros(ioh.nelv * ioh.lxyz, dtype=ioh.pynek_dtype)
-
-        u = x
-        v = y
-        w = z
-        fld_file_read_vector_field(fh, byte_offset, ioh, x=u, y=v, z=w)
-        for e in range(0, ioh.nelv):
-            data.elem[e].vel[0, :, :, :] = u[e, :, :, :].copy()
-            data.elem[e].vel[1, :, :, :] = v[e, :, :, :].copy()
-            data.elem[e].vel[2, :, :, :] = w[e, :, :, :].copy()
+        reads.append(("Reading velocity data", vel, 0, ioh.gdim, byte_offset))
         mpi_offset += ioh.glb_nelv * ioh.gdim * ioh.lxyz * ioh.fld_data_size
 
-    # Read pressure
     if ioh.pres_variables > 0:
+        pres = np.empty((ioh.nelv, 1, ioh.lz, ioh.ly, ioh.lx), dtype=data_dtype)
         byte_offset = mpi_offset + ioh.offset_el * 1 * ioh.lxyz * ioh.fld_data_size
-
-        log.write("debug", "Reading pressure data")
-        if "x" not in locals():
-            x = np.zeros(ioh.nelv * ioh.lxyz, dtype=ioh.pynek_dtype)
-
-        p = x
-        fld_file_read_field(fh, byte_offset, ioh, x=p)
-        for e in range(0, ioh.nelv):
-            data.elem[e].pres[0, :, :, :] = p[e, :, :, :].copy()
+        reads.append(("Reading pressure data", pres, 0, 1, byte_offset))
         mpi_offset += ioh.glb_nelv * 1 * ioh.lxyz * ioh.fld_data_size
 
-    # Read temperature
     if ioh.temp_variables > 0:
+        temp = np.empty((ioh.nelv, 1, ioh.lz, ioh.ly, ioh.lx), dtype=data_dtype)
         byte_offset = mpi_offset + ioh.offset_el * 1 * ioh.lxyz * ioh.fld_data_size
-        log.write("debug", "Reading temperature data")
-        if "x" not in locals():
-            x = np.zeros(ioh.nelv * ioh.lxyz, dtype=ioh.pynek_dtype)
-        t = x
-        fld_file_read_field(fh, byte_offset, ioh, x=t)
-        for e in range(0, ioh.nelv):
-            data.elem[e].temp[0, :, :, :] = t[e, :, :, :].copy()
+        reads.append(("Reading temperature data", temp, 0, 1, byte_offset))
         mpi_offset += ioh.glb_nelv * 1 * ioh.lxyz * ioh.fld_data_size
 
-    # Read scalars
-    ii = 0
-    for var in range(0, ioh.scalar_variables):
-        if ii == 0:  # Only print once
-            log.write("debug", "Reading scalar data")
-            ii += 1
+    # The scalars are read together afterwards
+    if ioh.scalar_variables > 0:
+        scal = np.empty(
+            (ioh.nelv, ioh.scalar_variables, ioh.lz, ioh.ly, ioh.lx), dtype=data_dtype
+        )
+        scal_byte_offset = (
+            mpi_offset + ioh.offset_el * 1 * ioh.lxyz * ioh.fld_data_size
+        )
+        mpi_offset += (
+            ioh.glb_nelv * ioh.scalar_variables * ioh.lxyz * ioh.fld_data_size
+        )
 
-        byte_offset = mpi_offset + ioh.offset_el * 1 * ioh.lxyz * ioh.fld_data_size
-        if "x" not in locals():
-            x = np.zeros(ioh.nelv * ioh.lxyz, dtype=ioh.pynek_dtype)
-        s = x
-        fld_file_read_field(fh, byte_offset, ioh, x=s)
-        for e in range(0, ioh.nelv):
-            data.elem[e].scal[var, :, :, :] = s[e, :, :, :].copy()
-        mpi_offset += ioh.glb_nelv * 1 * ioh.lxyz * ioh.fld_data_size
+    file_dtype = ioh.file_dtype
+
+    if np.dtype(data_dtype) == np.dtype(file_dtype):
+        # The data does not need to be converted, so it is read directly
+        # into the fields. All the reads are started at once
+        requests = []
+        for message, field, first, nvar, byte_offset in reads:
+            if not isinstance(message, type(None)):
+                log.write("debug", message)
+            requests.append(
+                fld_file_iread_into_elements(fh, byte_offset, field, first, nvar, ioh)
+            )
+        MPI.Request.Waitall(requests)
+        if ioh.byteswap:
+            for _, field, first, nvar, _ in reads:
+                field[:, first : first + nvar].byteswap(inplace=True)
+        reads = []
+
+    # Read the fields. The read of the next field is started before the
+    # current one is unpacked, so two buffers are used in turns
+    buffers = []
+    if len(reads) > 0:
+        buffers = [np.empty(ioh.gdim * ioh.n, dtype=file_dtype) for _ in range(2)]
+        _, _, _, nvar, byte_offset = reads[0]
+        req = fld_file_iread(fh, byte_offset, buffers[0][: nvar * ioh.n])
+    for k, (message, field, first, nvar, _) in enumerate(reads):
+        req.Wait()
+        buff = buffers[k % 2][: nvar * ioh.n]
+        if ioh.byteswap:
+            buff.byteswap(inplace=True)
+
+        if k + 1 < len(reads):
+            _, _, _, next_nvar, next_byte_offset = reads[k + 1]
+            req = fld_file_iread(
+                fh, next_byte_offset, buffers[(k + 1) % 2][: next_nvar * ioh.n]
+            )
+
+        if not isinstance(message, type(None)):
+            log.write("debug", message)
+        # The file holds the variables one after the other in each element
+        unpack_element_fields(buff, field, first)
+
+    # Read all the scalars with one collective call
+    if ioh.scalar_variables > 0:
+        log.write("debug", "Reading scalar data")
+        fld_file_read_fields(fh, scal_byte_offset, scal, ioh)
 
     fh.Close()
 
+    # Only the fields in the file are returned
+    fields = {"elmap": idx}
+    if ioh.pos_variables > 0:
+        fields["pos"] = pos
+    if ioh.vel_variables > 0:
+        fields["vel"] = vel
+    if ioh.pres_variables > 0:
+        fields["pres"] = pres
+    if ioh.temp_variables > 0:
+        fields["temp"] = temp
+    if ioh.scalar_variables > 0:
+        fields["scal"] = scal
+
+    return header, ioh, fields
+
+
+def hexadata_from_fields(header, ioh, fields, log):
+    """Create a pymech hexadata object whose elements are views of the fields.
+
+    :meta private:
+    """
+
+    # Create the pymech hexadata object
+    log.write("debug", "Creating HexaData object")
+    data = HexaData(
+        header.nb_dims,
+        ioh.nelv,
+        header.orders,
+        header.nb_vars,
+        0,
+        dtype=ioh.pynek_dtype,
+    )
+    data.time = header.time
+    data.istep = header.istep
+    data.wdsz = header.wdsz
+    data.endian = sys.byteorder
+    data.elmap = fields["elmap"]
+
+    # Make the elements views of the fields
+    for e in range(0, ioh.nelv):
+        if ioh.pos_variables > 0:
+            data.elem[e].pos = fields["pos"][e]
+        if ioh.vel_variables > 0:
+            data.elem[e].vel = fields["vel"][e]
+        if ioh.pres_variables > 0:
+            data.elem[e].pres = fields["pres"][e]
+        if ioh.temp_variables > 0:
+            data.elem[e].temp = fields["temp"][e]
+        if ioh.scalar_variables > 0:
+            data.elem[e].scal = fields["scal"][e]
+
+    return data
+
+
+# @profile
+def preadnek(filename, comm, data_dtype=np.double):
+    """
+    Read and fld file and return a pymech hexadata object (Parallel).
+
+    Main function for readinf nek type fld filed.
+
+    Parameters
+    ----------
+    filename : str
+        The filename of the fld file.
+
+    comm : Comm
+        MPI communicator.
+
+    data_dtype : str
+        The data type of the data in the file. (Default value = "float64").
+        If None, the precision of the file is kept, which avoids converting
+        the data and halves the memory for single precision files.
+
+    Returns
+    -------
+    HexaData
+        The data read from the file in a pymech hexadata object.
+
+    Examples
+    --------
+    >>> from mpi4py import MPI
+    >>> from pysemtools.io.ppymech.neksuite import preadnek
+    >>> comm = MPI.COMM_WORLD
+    >>> data = preadnek('field00001.fld', comm)
+    """
+    log = Logger(comm=comm, module_name="preadnek")
+    log.tic()
+    log.write("info", "Reading file: {}".format(filename))
+
+    header, ioh, fields = read_fld_fields(filename, comm, data_dtype, log)
+
+    data = hexadata_from_fields(header, ioh, fields, log)
+
     log.write("debug", "File read")
     log.toc()
 
@@ -359,6 +597,185 @@ def preadnek(filename, comm, data_dtype=np.double):
     return data
 
 
+def preadnek_arrays(filename, comm, data_dtype=np.double):
+    """
+    Read a fld file and return its fields as numpy arrays (Parallel).
+
+    This is the same as preadnek, but no pymech hexadata object is created.
+    It is useful when the fields are only used for numerical operations.
+
+    Parameters
+    ----------
+    filename : str
+        The filename of the fld file.
+
+    comm : Comm
+        MPI communicator.
+
+    data_dtype : str
+        The data type of the data in the file. (Default value = "float64").
+        If None, the precision of the file is kept.
+
+    Returns
+    -------
+    dict
+        The fields of the elements of this rank. The keys are "pos", "vel",
+        "pres", "temp" and "scal", for the fields that are in the file,
+        and the values are contiguous arrays of shape (nelv, nvars, lz, ly, lx).
+        The key "elmap" holds the element mapping.
+
+    Examples
+    --------
+    >>> from mpi4py import MPI
+    >>> from pysemtools.io.ppymech.neksuite import preadnek_arrays
+    >>> comm = MPI.COMM_WORLD
+    >>> fields = preadnek_arrays('field00001.fld', comm)
+    >>> u = fields["vel"][:, 0]
+    """
+    log = Logger(comm=comm, module_name="preadnek_arrays")
+    log.tic()
+    log.write("info", "Reading file: {}".format(filename))
+
+    _, _, fields = read_fld_fields(filename, comm, data_dtype, log)
+
+    log.write("debug", "File read")
+    log.toc()
+
+    del log
+
+    return fields
+
+
+class NekReader:
+    """
+    Read a series of fld files in parallel.
+
+    The MPI info object with the hints for the file system is created once
+    and kept for all the files that are read, so it is not created again for
+    each of them. This is useful to read, for example, all the files of a
+    time series.
+
+    Parameters
+    ----------
+    comm : Comm
+        MPI communicator.
+
+    data_dtype : str
+        The data type of the data in the files. (Default value = "float64").
+        If None, the precision of each file is kept.
+
+    hints : dict, optional
+        MPI-IO hints used to open the files. The default read hints are used
+        if not given.
+
+    Examples
+    --------
+    >>> from mpi4py import MPI
+    >>> from pysemtools.io.ppymech.neksuite import NekReader
+    >>> comm = MPI.COMM_WORLD
+    >>> with NekReader(comm) as reader:
+    >>>     for i in range(1, 11):
+    >>>         data = reader.read(f'field0.f{i:05d}')
+    """
+
+    def __init__(self, comm, data_dtype=np.double, hints=None):
+
+        self.comm = comm
+        self.data_dtype = data_dtype
+        if isinstance(hints, type(None)):
+            hints = read_hints
+        self.hints = hints
+        self.info = None
+
+    def __enter__(self):
+        self.info = get_io_info(self.hints)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Free the MPI info object.
+
+        This is done automatically when the reader is used as a context manager.
+        """
+
+        if not isinstance(self.info, type(None)):
+            self.info.Free()
+            self.info = None
+
+    def read(self, filename):
+        """
+        Read a fld file and return a pymech hexadata object.
+
+        Parameters
+        ----------
+        filename : str
+            The filename of the fld file.
+
+        Returns
+        -------
+        HexaData
+            The data read from the file in a pymech hexadata object.
+        """
+
+        log = Logger(comm=self.comm, module_name="NekReader")
+        log.tic()
+        log.write("info", "Reading file: {}".format(filename))
+
+        header, ioh, fields = self._read_fields(filename, log)
+        data = hexadata_from_fields(header, ioh, fields, log)
+
+        log.write("debug", "File read")
+        log.toc()
+
+        del log
+
+        return data
+
+    def read_arrays(self, filename):
+        """
+        Read a fld file and return its fields as numpy arrays.
+
+        Parameters
+        ----------
+        filename : str
+            The filename of the fld file.
+
+        Returns
+        -------
+        dict
+            The fields of the elements of this rank, as returned by preadnek_arrays.
+        """
+
+        log = Logger(comm=self.comm, module_name="NekReader")
+        log.tic()
+        log.write("info", "Reading file: {}".format(filename))
+
+        _, _, fields = self._read_fields(filename, log)
+
+        log.write("debug", "File read")
+        log.toc()
+
+        del log
+
+        return fields
+
+    def _read_fields(self, filename, log):
+        """Read the fields with the info object of the reader
+
+        :meta private:
+        """
+
+        if isinstance(self.info, type(None)):
+            self.info = get_io_info(self.hints)
+
+        return read_fld_fields(
+            filename, self.comm, self.data_dtype, log, info=self.info
+        )
+
+
 # @profile
 def pynekread(filename, comm, data_dtype=np.double, msh=None, fld=None):
     """
@@ -402,11 +819,6 @@ def pynekread(filename, comm, data_dtype=np.double, msh=None, fld=None):
     log.tic()
     log.write("info", "Reading file: {}".format(filename))
 
-    mpi_int_size = MPI.INT.Get_size()
-    mpi_real_size = MPI.REAL.Get_size()
-    # mpi_double_size = MPI.DOUBLE.Get_size()
-    mpi_character_size = MPI.CHARACTER.Get_size()
-
     # Read the header
     header = read_header(filename)
 
@@ -431,16 +843,22 @@ def pynekread(filename, comm, data_dtype=np.double, msh=None, fld=None):
     # data.endian = sys.byteorder
 
     # Open the file
-    fh = MPI.File.Open(comm, filename, MPI.MODE_RDONLY)
+    info = get_io_info(read_hints)
+    fh = MPI.File.Open(comm, filename, MPI.MODE_RDONLY, info=info)
+    info.Free()
 
     # Read the test pattern
     mpi_offset = np.int64(132 * mpi_character_size)
+    # Only one rank reads it, the rest get it from there
     test_pattern = np.zeros(1, dtype=np.single)
-    fh.Read_at_all(mpi_offset, test_pattern, status=None)
+    if comm.Get_rank() == 0:
+        fh.Read_at(mpi_offset, test_pattern, status=None)
+    comm.Bcast(test_pattern, root=0)
+    ioh.byteswap = check_byteswap(test_pattern)
 
     # Read the indices?
     mpi_offset += mpi_real_size
-    idx = np.zeros(ioh.nelv, dtype=np.int32)
+    idx = np.empty(ioh.nelv, dtype=np.int32)
     byte_offset = mpi_offset + ioh.offset_el * mpi_int_size
     fh.Read_at_all(byte_offset, idx, status=None)
     # data.elmap = idx
@@ -520,21 +938,24 @@ def pynekread(filename, comm, data_dtype=np.double, msh=None, fld=None):
         else:
             mpi_offset += ioh.glb_nelv * 1 * ioh.lxyz * ioh.fld_data_size
 
-    # Read scalars
-    ii = 0
-    for var in range(0, ioh.scalar_variables):
+    # Read all the scalars with one collective call
+    if ioh.scalar_variables > 0:
         if not isinstance(fld, type(None)):
-            log.write("debug", f"Reading scalar {var} data")
+            log.write("debug", "Reading scalar data")
 
             byte_offset = mpi_offset + ioh.offset_el * 1 * ioh.lxyz * ioh.fld_data_size
 
-            s = np.zeros(ioh.nelv * ioh.lxyz, dtype=ioh.pynek_dtype)
-            fld_file_read_field(fh, byte_offset, ioh, x=s)
-            fld.fields["scal"].append(s.copy())
+            s = np.empty(
+                (ioh.nelv, ioh.scalar_variables, ioh.lz, ioh.ly, ioh.lx),
+                dtype=ioh.pynek_dtype,
+            )
+            fld_file_read_fields(fh, byte_offset, s, ioh)
+            for var in range(0, ioh.scalar_variables):
+                fld.fields["scal"].append(s[:, var].copy())
 
-            mpi_offset += ioh.glb_nelv * 1 * ioh.lxyz * ioh.fld_data_size
-        else:
-            mpi_offset += ioh.glb_nelv * 1 * ioh.lxyz * ioh.fld_data_size
+        mpi_offset += (
+            ioh.glb_nelv * ioh.scalar_variables * ioh.lxyz * ioh.fld_data_size
+        )
 
     if not isinstance(fld, type(None)):
         fld.t = header.time
@@ -587,11 +1008,6 @@ def pynekread_field(filename, comm, data_dtype=np.double, key=""):
 
     log.write("info", f"Reading field: {key} from file: {filename}")
 
-    mpi_int_size = MPI.INT.Get_size()
-    mpi_real_size = MPI.REAL.Get_size()
-    # mpi_double_size = MPI.DOUBLE.Get_size()
-    mpi_character_size = MPI.CHARACTER.Get_size()
-
     # Read the header
     header = read_header(filename)
 
@@ -616,16 +1032,22 @@ def pynekread_field(filename, comm, data_dtype=np.double, key=""):
     # data.endian = sys.byteorder
 
     # Open the file
-    fh = MPI.File.Open(comm, filename, MPI.MODE_RDONLY)
+    info = get_io_info(read_hints)
+    fh = MPI.File.Open(comm, filename, MPI.MODE_RDONLY, info=info)
+    info.Free()
 
     # Read the test pattern
     mpi_offset = np.int64(132 * mpi_character_size)
+    # Only one rank reads it, the rest get it from there
     test_pattern = np.zeros(1, dtype=np.single)
-    fh.Read_at_all(mpi_offset, test_pattern, status=None)
+    if comm.Get_rank() == 0:
+        fh.Read_at(mpi_offset, test_pattern, status=None)
+    comm.Bcast(test_pattern, root=0)
+    ioh.byteswap = check_byteswap(test_pattern)
 
     # Read the indices?
     mpi_offset += mpi_real_size
-    idx = np.zeros(ioh.nelv, dtype=np.int32)
+    idx = np.empty(ioh.nelv, dtype=np.int32)
     byte_offset = mpi_offset + ioh.offset_el * mpi_int_size
     fh.Read_at_all(byte_offset, idx, status=None)
     # data.elmap = idx
@@ -762,11 +1184,6 @@ def pwritenek(filename, data, comm):
     >>> pwritenek('field00001.fld', data, comm)
     """
 
-    mpi_int_size = MPI.INT.Get_size()
-    mpi_real_size = MPI.REAL.Get_size()
-    # mpi_double_size = MPI.DOUBLE.Get_size()
-    mpi_character_size = MPI.CHARACTER.Get_size()
-
     # instance a dummy header
     dh = Header(
         data.wdsz,
@@ -807,190 +1224,155 @@ def pwritenek(filename, data, comm):
 
     # Open the file
     amode = MPI.MODE_WRONLY | MPI.MODE_CREATE
-    fh = MPI.File.Open(comm, filename, amode)
+    info = get_io_info(write_hints)
+    fh = MPI.File.Open(comm, filename, amode, info=info)
+    info.Free()
 
-    # Write the header
+    # Write the header and test pattern.
+    # They are the same for all ranks, so only one writes them
     mpi_offset = np.int64(0)
-    fh.Write_all(h.as_bytestring())
-    mpi_offset += 132 * mpi_character_size
-
-    # write test pattern
     test_pattern = np.zeros(1, dtype=np.single)
     test_pattern[0] = 6.54321
-    fh.Write_all(test_pattern)
+    if comm.Get_rank() == 0:
+        fh.Write_at(mpi_offset, h.as_bytestring(), status=None)
+        fh.Write_at(mpi_offset + 132 * mpi_character_size, test_pattern, status=None)
+    mpi_offset += 132 * mpi_character_size
     mpi_offset += mpi_real_size
 
     # write element mapping
-    idx = np.zeros(ioh.nelv, dtype=np.int32)
-    for i in range(0, data.nel):
-        idx[i] = data.elmap[i]
+    idx = np.ascontiguousarray(data.elmap[: ioh.nelv], dtype=np.int32)
     byte_offset = mpi_offset + ioh.offset_el * mpi_int_size
     fh.Write_at_all(byte_offset, idx, status=None)
     mpi_offset += ioh.glb_nelv * mpi_int_size
 
+    # See which fields can be written directly from the elements.
+    # They are all written together with one collective call
+    in_place = elements_in_file_precision(
+        data, ("pos", "vel", "pres", "temp", "scal"), ioh, comm
+    )
+    in_place_fields = []
+
+    # The metadata is computed from the gathered fields, or directly from the
+    # elements if they are not gathered. Each entry has the buffer and
+    # variables per element
+    write_metadata = ioh.gdim > 2
+    metadata = []
+
     # Write the coordinates
     if ioh.pos_variables > 0:
-        ddtype = data.elem[0].pos.dtype
-        x = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-        y = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-        z = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-        for e in range(0, ioh.nelv):
-            x[e, :, :, :] = data.elem[e].pos[0, :, :, :].copy()
-            y[e, :, :, :] = data.elem[e].pos[1, :, :, :].copy()
-            z[e, :, :, :] = data.elem[e].pos[2, :, :, :].copy()
         byte_offset = (
             mpi_offset + ioh.offset_el * ioh.gdim * ioh.lxyz * ioh.fld_data_size
         )
-        fld_file_write_vector_field(fh, byte_offset, x, y, z, ioh)
+        if in_place["pos"]:
+            # Write directly from the elements
+            blocks = [data.elem[e].pos[: ioh.gdim] for e in range(0, ioh.nelv)]
+            in_place_fields.append((byte_offset, blocks))
+            if write_metadata:
+                buff = element_metadata(data, "pos", ioh.gdim, ioh)
+                metadata.append((buff.reshape(-1), ioh.gdim))
+        else:
+            x, y, z = gather_element_vector(data, "pos", ioh)
+            if write_metadata:
+                metadata.append((fld_file_vector_metadata(x, y, z, ioh), ioh.gdim))
+            fld_file_write_vector_field(fh, byte_offset, x, y, z, ioh)
         mpi_offset += ioh.glb_nelv * ioh.gdim * ioh.lxyz * ioh.fld_data_size
 
     # Write the velocity
     if ioh.vel_variables > 0:
-        ddtype = data.elem[0].vel.dtype
-        if "x" not in locals():
-            x = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-        if "y" not in locals():
-            y = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-        if "z" not in locals():
-            z = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-
-        u = x.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-        v = y.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-        w = z.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-
-        for e in range(0, ioh.nelv):
-            u[e, :, :, :] = data.elem[e].vel[0, :, :, :].copy()
-            v[e, :, :, :] = data.elem[e].vel[1, :, :, :].copy()
-            w[e, :, :, :] = data.elem[e].vel[2, :, :, :].copy()
         byte_offset = (
             mpi_offset + ioh.offset_el * ioh.gdim * ioh.lxyz * ioh.fld_data_size
         )
-        fld_file_write_vector_field(fh, byte_offset, u, v, w, ioh)
+        if in_place["vel"]:
+            # Write directly from the elements
+            blocks = [data.elem[e].vel[: ioh.gdim] for e in range(0, ioh.nelv)]
+            in_place_fields.append((byte_offset, blocks))
+            if write_metadata:
+                buff = element_metadata(data, "vel", ioh.gdim, ioh)
+                metadata.append((buff.reshape(-1), ioh.gdim))
+        else:
+            u, v, w = gather_element_vector(data, "vel", ioh)
+            if write_metadata:
+                metadata.append((fld_file_vector_metadata(u, v, w, ioh), ioh.gdim))
+            fld_file_write_vector_field(fh, byte_offset, u, v, w, ioh)
         mpi_offset += ioh.glb_nelv * ioh.gdim * ioh.lxyz * ioh.fld_data_size
 
     # Write pressure
     if ioh.pres_variables > 0:
-        ddtype = data.elem[0].pres.dtype
-        if "x" not in locals():
-            x = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-
-        p = x.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-        for e in range(0, ioh.nelv):
-            p[e, :, :, :] = data.elem[e].pres[0, :, :, :].copy()
         byte_offset = mpi_offset + ioh.offset_el * 1 * ioh.lxyz * ioh.fld_data_size
-        fld_file_write_field(fh, byte_offset, p, ioh)
+        if in_place["pres"]:
+            # Write directly from the elements
+            blocks = [data.elem[e].pres[0] for e in range(0, ioh.nelv)]
+            in_place_fields.append((byte_offset, blocks))
+            if write_metadata:
+                buff = element_metadata(data, "pres", 1, ioh)
+                metadata.append((buff.reshape(-1), 1))
+        else:
+            p = gather_element_field(data, "pres", 0, ioh)
+            if write_metadata:
+                metadata.append((fld_file_metadata(p, ioh), 1))
+            fld_file_write_field(fh, byte_offset, p, ioh)
         mpi_offset += ioh.glb_nelv * 1 * ioh.lxyz * ioh.fld_data_size
 
     # Write Temperature
     if ioh.temp_variables > 0:
-        ddtype = data.elem[0].temp.dtype
-        if "x" not in locals():
-            x = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-
-        t = x.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-        for e in range(0, ioh.nelv):
-            t[e, :, :, :] = data.elem[e].temp[0, :, :, :].copy()
         byte_offset = mpi_offset + ioh.offset_el * 1 * ioh.lxyz * ioh.fld_data_size
-        fld_file_write_field(fh, byte_offset, t, ioh)
+        if in_place["temp"]:
+            # Write directly from the elements
+            blocks = [data.elem[e].temp[0] for e in range(0, ioh.nelv)]
+            in_place_fields.append((byte_offset, blocks))
+            if write_metadata:
+                buff = element_metadata(data, "temp", 1, ioh)
+                metadata.append((buff.reshape(-1), 1))
+        else:
+            t = gather_element_field(data, "temp", 0, ioh)
+            if write_metadata:
+                metadata.append((fld_file_metadata(t, ioh), 1))
+            fld_file_write_field(fh, byte_offset, t, ioh)
         mpi_offset += ioh.glb_nelv * 1 * ioh.lxyz * ioh.fld_data_size
 
     # Write scalars
-    for var in range(0, ioh.scalar_variables):
-        ddtype = data.elem[0].scal.dtype
-        if "x" not in locals():
-            x = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-
-        s = x.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-        for e in range(0, ioh.nelv):
-            s[e, :, :, :] = data.elem[e].scal[var, :, :, :].copy()
-        byte_offset = mpi_offset + ioh.offset_el * 1 * ioh.lxyz * ioh.fld_data_size
-        fld_file_write_field(fh, byte_offset, s, ioh)
-        mpi_offset += ioh.glb_nelv * 1 * ioh.lxyz * ioh.fld_data_size
-
-    # ================== Metadata
-    if ioh.gdim > 2:
-
-        # Write the coordinates
-        if ioh.pos_variables > 0:
-            ddtype = data.elem[0].pos.dtype
-            if "x" not in locals():
-                x = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-            if "y" not in locals():
-                y = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-            if "z" not in locals():
-                z = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-
-            x = x.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-            y = y.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-            z = z.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-
-            for e in range(0, ioh.nelv):
-                x[e, :, :, :] = data.elem[e].pos[0, :, :, :]
-                y[e, :, :, :] = data.elem[e].pos[1, :, :, :]
-                z[e, :, :, :] = data.elem[e].pos[2, :, :, :]
-            byte_offset = mpi_offset + ioh.offset_el * ioh.gdim * 2 * ioh.fld_data_size
-            fld_file_write_vector_metadata(fh, byte_offset, x, y, z, ioh)
-            mpi_offset += ioh.glb_nelv * ioh.gdim * 2 * ioh.fld_data_size
-
-        # Write the velocity
-        if ioh.vel_variables > 0:
-            ddtype = data.elem[0].vel.dtype
-            if "x" not in locals():
-                x = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-            if "y" not in locals():
-                y = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-            if "z" not in locals():
-                z = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-
-            u = x.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-            v = y.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-            w = z.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-            for e in range(0, ioh.nelv):
-                u[e, :, :, :] = data.elem[e].vel[0, :, :, :]
-                v[e, :, :, :] = data.elem[e].vel[1, :, :, :]
-                w[e, :, :, :] = data.elem[e].vel[2, :, :, :]
-            byte_offset = mpi_offset + ioh.offset_el * ioh.gdim * 2 * ioh.fld_data_size
-            fld_file_write_vector_metadata(fh, byte_offset, u, v, w, ioh)
-            mpi_offset += ioh.glb_nelv * ioh.gdim * 2 * ioh.fld_data_size
-
-        # Write pressure
-        if ioh.pres_variables > 0:
-            ddtype = data.elem[0].pres.dtype
-            if "x" not in locals():
-                x = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-
-            p = x.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-            for e in range(0, ioh.nelv):
-                p[e, :, :, :] = data.elem[e].pres[0, :, :, :]
-            byte_offset = mpi_offset + ioh.offset_el * 1 * 2 * ioh.fld_data_size
-            fld_file_write_metadata(fh, byte_offset, p, ioh)
-            mpi_offset += ioh.glb_nelv * 1 * 2 * ioh.fld_data_size
-
-        # Write Temperature
-        if ioh.temp_variables > 0:
-            ddtype = data.elem[0].temp.dtype
-            if "x" not in locals():
-                x = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
-
-            t = x.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
+    if ioh.scalar_variables > 0:
+        if in_place["scal"]:
+            # Write directly from the elements
+            for var in range(0, ioh.scalar_variables):
+                byte_offset = (
+                    mpi_offset + ioh.offset_el * 1 * ioh.lxyz * ioh.fld_data_size
+                )
+                blocks = [data.elem[e].scal[var] for e in range(0, ioh.nelv)]
+                in_place_fields.append((byte_offset, blocks))
+                mpi_offset += ioh.glb_nelv * 1 * ioh.lxyz * ioh.fld_data_size
+        else:
+            # Gather all the scalars and write them with one collective call
+            s = np.empty(
+                (ioh.nelv, ioh.scalar_variables, ioh.lz, ioh.ly, ioh.lx),
+                dtype=ioh.file_dtype,
+            )
             for e in range(0, ioh.nelv):
-                t[e, :, :, :] = data.elem[e].temp[0, :, :, :]
-            byte_offset = mpi_offset + ioh.offset_el * 1 * 2 * ioh.fld_data_size
-            fld_file_write_metadata(fh, byte_offset, t, ioh)
-            mpi_offset += ioh.glb_nelv * 1 * 2 * ioh.fld_data_size
-
-        # Write scalars
-        for var in range(0, ioh.scalar_variables):
-            ddtype = data.elem[0].scal.dtype
-            if "x" not in locals():
-                x = np.zeros((ioh.nelv, ioh.lz, ioh.ly, ioh.lx), dtype=ddtype)
+                s[e] = data.elem[e].scal[: ioh.scalar_variables]
+            byte_offset = mpi_offset + ioh.offset_el * 1 * ioh.lxyz * ioh.fld_data_size
+            fld_file_write_fields(fh, byte_offset, s, ioh)
+            mpi_offset += (
+                ioh.glb_nelv * ioh.scalar_variables * ioh.lxyz * ioh.fld_data_size
+            )
+        if write_metadata:
+            if in_place["scal"]:
+                buff = element_metadata(data, "scal", ioh.scalar_variables, ioh)
+            for var in range(0, ioh.scalar_variables):
+                if in_place["scal"]:
+                    var_buff = np.ascontiguousarray(buff[:, var]).reshape(-1)
+                else:
+                    var_buff = fld_file_metadata(s[:, var], ioh)
+                metadata.append((var_buff, 1))
+
+    # Write the fields that are written directly from the elements
+    if len(in_place_fields) > 0:
+        fld_file_write_element_fields(fh, in_place_fields, ioh)
 
-            s = x.reshape(ioh.nelv, ioh.lz, ioh.ly, ioh.lx)
-            for e in range(0, ioh.nelv):
-                s[e, :, :, :] = data.elem[e].scal[var, :, :, :]
-            byte_offset = mpi_offset + ioh.offset_el * 1 * 2 * ioh.fld_data_size
-            fld_file_write_metadata(fh, byte_offset, s, ioh)
-            mpi_offset += ioh.glb_nelv * 1 * 2 * ioh.fld_data_size
+    # ================== Metadata
+    for buff, nvar in metadata:
+        byte_offset = mpi_offset + ioh.offset_el * nvar * 2 * ioh.fld_data_size
+        fld_file_write_metadata_buffer(fh, byte_offset, buff)
+        mpi_offset += ioh.glb_nelv * nvar * 2 * ioh.fld_data_size
 
     fh.Close()
 
@@ -1039,11 +1421,6 @@ def pynekwrite(filename, comm, msh=None, fld=None, wdsz=4, istep=0, write_mesh=T
     log.tic()
     log.write("info", "Writing file: {}".format(filename))
 
-    mpi_int_size = MPI.INT.Get_size()
-    mpi_real_size = MPI.REAL.Get_size()
-    # mpi_double_size = MPI.DOUBLE.Get_size()
-    mpi_character_size = MPI.CHARACTER.Get_size()
-
     # associate inputs
     if write_mesh:
         msh_fields = msh.gdim
@@ -1099,23 +1476,23 @@ def pynekwrite(filename, comm, msh=None, fld=None, wdsz=4, istep=0, write_mesh=T
 
     # Open the file
     amode = MPI.MODE_WRONLY | MPI.MODE_CREATE
-    fh = MPI.File.Open(comm, filename, amode)
+    info = get_io_info(write_hints)
+    fh = MPI.File.Open(comm, filename, amode, info=info)
+    info.Free()
 
-    # Write the header
+    # Write the header and test pattern.
+    # They are the same for all ranks, so only one writes them
     mpi_offset = np.int64(0)
-    fh.Write_all(h.as_bytestring())
-    mpi_offset += 132 * mpi_character_size
-
-    # write test pattern
     test_pattern = np.zeros(1, dtype=np.single)
     test_pattern[0] = 6.54321
-    fh.Write_all(test_pattern)
+    if comm.Get_rank() == 0:
+        fh.Write_at(mpi_offset, h.as_bytestring(), status=None)
+        fh.Write_at(mpi_offset + 132 * mpi_character_size, test_pattern, status=None)
+    mpi_offset += 132 * mpi_character_size
     mpi_offset += mpi_real_size
 
     # write element mapping
-    idx = np.zeros(ioh.nelv, dtype=np.int32)
-    for i in range(0, ioh.nelv):
-        idx[i] = i + ioh.offset_el
+    idx = np.arange(ioh.offset_el, ioh.offset_el + ioh.nelv, dtype=np.int32)
     byte_offset = mpi_offset + ioh.offset_el * mpi_int_size
     fh.Write_at_all(byte_offset, idx, status=None)
     mpi_offset += ioh.glb_nelv * mpi_int_size
@@ -1175,16 +1552,19 @@ def pynekwrite(filename, comm, msh=None, fld=None, wdsz=4, istep=0, write_mesh=T
         fld_file_write_field(fh, byte_offset, t, ioh)
         mpi_offset += ioh.glb_nelv * 1 * ioh.lxyz * ioh.fld_data_size
 
-    # Write scalars
-    ii = 0
-    for var in range(0, ioh.scalar_variables):
-        if ii == 0:  # Only print once
-            log.write("debug", "Writing scalar data")
-            ii += 1
-        s = fld.fields["scal"][var]
+    # Write all the scalars with one collective call
+    if ioh.scalar_variables > 0:
+        log.write("debug", "Writing scalar data")
+        s = np.empty(
+            (ioh.nelv, ioh.scalar_variables, ioh.lxyz), dtype=ioh.file_dtype
+        )
+        for var in range(0, ioh.scalar_variables):
+            s[:, var] = fld.fields["scal"][var].reshape(ioh.nelv, ioh.lxyz)
         byte_offset = mpi_offset + ioh.offset_el * 1 * ioh.lxyz * ioh.fld_data_size
-        fld_file_write_field(fh, byte_offset, s, ioh)
-        mpi_offset += ioh.glb_nelv * 1 * ioh.lxyz * ioh.fld_data_size
+        fld_file_write_fields(fh, byte_offset, s, ioh)
+        mpi_offset += (
+            ioh.glb_nelv * ioh.scalar_variables * ioh.lxyz * ioh.fld_data_size
+        )
 
     # Reshape data
     msh.x.shape = field_shape
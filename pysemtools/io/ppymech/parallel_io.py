@@ -1,9 +1,59 @@
 """ Module providing parallel IO routines for fld files """
 
 import numpy as np
+from mpi4py import MPI
 
 int32_limit = np.int64(2 ** 31 - 1)
 
+def fld_file_iread(fh, byte_offset, buff):
+    """Function used to start a non blocking collective read of a fld file
+
+    The request that is returned must be completed before using the buffer"""
+
+    # Check if it is too much data
+    check_data_count(buff)
+
+    return fh.Iread_at_all(byte_offset, buff)
+
+
+def fld_file_iread_into_elements(fh, byte_offset, field, first, nvar, ioh):
+    """Function used to start a non blocking collective read of a fld file
+    directly into an array of shape (nelv, nvars, lz, ly, lx).
+
+    The variables first to first + nvar of each element are read, which are
+    strided in memory. They are described with an MPI data type, so no
+    buffer is needed. The array must be contiguous and of the precision of
+    the file. The request that is returned must be completed before using it"""
+
+    # Associate
+    fld_data_size = ioh.fld_data_size
+    nelv = ioh.nelv
+    lxyz = ioh.lxyz
+
+    if fld_data_size == 4:
+        mpi_type = MPI.FLOAT
+    else:
+        mpi_type = MPI.DOUBLE
+
+    # Check if it is too much data
+    if np.int64(nelv) * nvar * lxyz >= int32_limit:
+        raise ValueError(
+            "The count to read is too large according to MPI standard (max int32 = 2**31 -1 counts), use chunks or more ranks"
+        )
+
+    # The blocks of the variables in each element, starting at the first one
+    buff = field.reshape(-1)[first * lxyz :]
+    blocks_type = mpi_type.Create_vector(nelv, nvar * lxyz, field.shape[1] * lxyz)
+    blocks_type.Commit()
+
+    req = fh.Iread_at_all(byte_offset, [buff, 1, blocks_type])
+
+    # The pending read is not affected by freeing the data type
+    blocks_type.Free()
+
+    return req
+
+
 def fld_file_read_vector_field(fh, byte_offset, ioh, x=None, y=None, z=None):
     """Function used to read a vector field from a fld file"""
 
@@ -45,6 +95,8 @@ def fld_file_read_vector_field(fh, byte_offset, ioh, x=None, y=None, z=None):
         # Check if it is too much data
         check_data_count(tmp_sp_vector)
         fh.Read_at_all(byte_offset, tmp_sp_vector, status=None)
+        if ioh.byteswap:
+            tmp_sp_vector.byteswap(inplace=True)
         tmp_original_shape = tmp_sp_vector.shape
 
         tmp_sp_vector.shape = (nelv, lxyz * gdim)
@@ -61,6 +113,8 @@ def fld_file_read_vector_field(fh, byte_offset, ioh, x=None, y=None, z=None):
         # Check if it is too much data
         check_data_count(tmp_dp_vector)
         fh.Read_at_all(byte_offset, tmp_dp_vector, status=None)
+        if ioh.byteswap:
+            tmp_dp_vector.byteswap(inplace=True)
 
         tmp_original_shape = tmp_dp_vector.shape
 
@@ -114,6 +168,8 @@ def fld_file_read_field(fh, byte_offset, ioh, x=None):
         check_data_count(tmp_sp_field)
 
         fh.Read_at_all(byte_offset, tmp_sp_field, status=None)
+        if ioh.byteswap:
+            tmp_sp_field.byteswap(inplace=True)
         x[:] = tmp_sp_field.flatten()
 
     else:
@@ -122,6 +178,8 @@ def fld_file_read_field(fh, byte_offset, ioh, x=None):
         check_data_count(tmp_dp_field)
 
         fh.Read_at_all(byte_offset, tmp_dp_field, status=None)
+        if ioh.byteswap:
+            tmp_dp_field.byteswap(inplace=True)
         x[:] = tmp_dp_field.flatten()
 
     # Reshape to pymech compatible
@@ -220,8 +278,179 @@ def fld_file_write_field(fh, byte_offset, x, ioh):
     return
 
 
-def fld_file_write_vector_metadata(fh, byte_offset, x, y, z, ioh):
-    """Function used to write metadata of a vector field to a fld file"""
+def fld_file_write_element_fields(fh, fields, ioh):
+    """Function used to write fields of the elements to a fld file without copies.
+
+    Each field is given as its byte offset in the file and a list with one
+    block per element. The blocks are described by an MPI data type with their
+    addresses, so they are written from where they are stored, and the file
+    view places each field at its offset. All the fields are then written with
+    a single collective call. The blocks must be contiguous and of the
+    precision of the file"""
+
+    # Associate
+    fld_data_size = ioh.fld_data_size
+    nelv = ioh.nelv
+
+    if fld_data_size == 4:
+        mpi_type = MPI.FLOAT
+    else:
+        mpi_type = MPI.DOUBLE
+
+    block_lengths = []
+    block_displacements = []
+    field_lengths = []
+    field_displacements = []
+    for byte_offset, blocks in fields:
+        block_size = blocks[0].size if nelv > 0 else 0
+
+        # Where each block is in memory
+        block_lengths.extend([block_size] * nelv)
+        block_displacements.extend([MPI.Get_address(block) for block in blocks])
+
+        # Where the blocks of this field go in the file
+        field_lengths.append(int(nelv * block_size))
+        field_displacements.append(int(byte_offset))
+
+    # Check if it is too much data
+    if np.sum(np.array(field_lengths, dtype=np.int64)) >= int32_limit:
+        raise ValueError(
+            "The count to write is too large according to MPI standard (max int32 = 2**31 -1 counts), use chunks or more ranks"
+        )
+
+    memory_type = mpi_type.Create_hindexed(block_lengths, block_displacements)
+    memory_type.Commit()
+    file_type = mpi_type.Create_hindexed(field_lengths, field_displacements)
+    file_type.Commit()
+
+    fh.Set_view(0, mpi_type, file_type)
+    fh.Write_at_all(0, [MPI.BOTTOM, 1, memory_type], status=None)
+
+    # Go back to the default view, where offsets are in bytes
+    fh.Set_view(0, MPI.BYTE, MPI.BYTE)
+
+    memory_type.Free()
+    file_type.Free()
+
+    return
+
+
+def fld_file_fields_types(nfields, ioh):
+    """Function used to create the MPI data types that describe several
+    consecutive fields of a fld file, such as the scalars.
+
+    In memory, the fields are in an array of shape (nelv, nfields, lz, ly, lx),
+    so the variables of each element are together. In the file, the part of
+    this rank of each field is separated from the next one by the parts of
+    the other ranks. The caller must free the data types"""
+
+    # Associate
+    fld_data_size = ioh.fld_data_size
+    nelv = ioh.nelv
+    glb_nelv = ioh.glb_nelv
+    lxyz = ioh.lxyz
+
+    if fld_data_size == 4:
+        mpi_type = MPI.FLOAT
+    else:
+        mpi_type = MPI.DOUBLE
+
+    # Check if it is too much data
+    if np.int64(nelv) * nfields * lxyz >= int32_limit:
+        raise ValueError(
+            "The count is too large according to MPI standard (max int32 = 2**31 -1 counts), use chunks or more ranks"
+        )
+
+    # One field of all elements, then the next field
+    element_type = mpi_type.Create_vector(nelv, lxyz, nfields * lxyz)
+    memory_type = element_type.Create_hvector(
+        nfields, 1, int(lxyz * fld_data_size)
+    )
+    memory_type.Commit()
+    element_type.Free()
+
+    file_type = mpi_type.Create_vector(nfields, nelv * lxyz, glb_nelv * lxyz)
+    file_type.Commit()
+
+    return mpi_type, memory_type, file_type
+
+
+def fld_file_read_fields(fh, byte_offset, x, ioh):
+    """Function used to read consecutive fields of a fld file with one
+    collective call into an array of shape (nelv, nfields, lz, ly, lx).
+
+    The byte offset is the one of the part of this rank of the first field.
+    If the array is contiguous and of the precision of the file, the data is
+    read directly into it"""
+
+    # Associate
+    fld_data_size = ioh.fld_data_size
+    nfields = x.shape[1]
+
+    if fld_data_size == 4:
+        file_dtype = np.single
+    else:
+        file_dtype = np.double
+
+    if x.dtype == file_dtype and x.flags.c_contiguous:
+        buff = x
+    else:
+        buff = np.empty(x.shape, dtype=file_dtype)
+
+    mpi_type, memory_type, file_type = fld_file_fields_types(nfields, ioh)
+
+    fh.Set_view(int(byte_offset), mpi_type, file_type)
+    fh.Read_at_all(0, [buff, 1, memory_type], status=None)
+
+    # Go back to the default view, where offsets are in bytes
+    fh.Set_view(0, MPI.BYTE, MPI.BYTE)
+
+    memory_type.Free()
+    file_type.Free()
+
+    if ioh.byteswap:
+        buff.byteswap(inplace=True)
+
+    if buff is not x:
+        x[...] = buff
+
+    return
+
+
+def fld_file_write_fields(fh, byte_offset, x, ioh):
+    """Function used to write consecutive fields to a fld file with one
+    collective call from an array of shape (nelv, nfields, lz, ly, lx).
+
+    The byte offset is the one of the part of this rank of the first field.
+    The array is converted to the precision of the file if needed"""
+
+    # Associate
+    fld_data_size = ioh.fld_data_size
+    nfields = x.shape[1]
+
+    if fld_data_size == 4:
+        file_dtype = np.single
+    else:
+        file_dtype = np.double
+
+    buff = np.ascontiguousarray(x, dtype=file_dtype)
+
+    mpi_type, memory_type, file_type = fld_file_fields_types(nfields, ioh)
+
+    fh.Set_view(int(byte_offset), mpi_type, file_type)
+    fh.Write_at_all(0, [buff, 1, memory_type], status=None)
+
+    # Go back to the default view, where offsets are in bytes
+    fh.Set_view(0, MPI.BYTE, MPI.BYTE)
+
+    memory_type.Free()
+    file_type.Free()
+
+    return
+
+
+def fld_file_vector_metadata(x, y, z, ioh):
+    """Function used to compute the metadata of a vector field of a fld file"""
 
     # Associate
     nelv = ioh.nelv
@@ -237,17 +466,12 @@ def fld_file_write_vector_metadata(fh, byte_offset, x, y, z, ioh):
     if gdim > 2:
         buff[4 : offset * nelv : offset] = np.min(z[:nelv], axis=(1, 2, 3))
         buff[5 : offset * nelv : offset] = np.max(z[:nelv], axis=(1, 2, 3))
-    
-    # Check if it is too much data
-    check_data_count(buff)
 
-    fh.Write_at_all(byte_offset, buff, status=None)
+    return buff
 
-    return
 
-
-def fld_file_write_metadata(fh, byte_offset, x, ioh):
-    """Function used to write metadata of a scalar field to a fld file"""
+def fld_file_metadata(x, ioh):
+    """Function used to compute the metadata of a scalar field of a fld file"""
 
     # Associate
     nelv = ioh.nelv
@@ -259,6 +483,12 @@ def fld_file_write_metadata(fh, byte_offset, x, ioh):
     buff[: offset * nelv : offset] = np.min(x[:nelv], axis=(1, 2, 3))
     buff[1 : offset * nelv : offset] = np.max(x[:nelv], axis=(1, 2, 3))
 
+    return buff
+
+
+def fld_file_write_metadata_buffer(fh, byte_offset, buff):
+    """Function used to write metadata that was already computed to a fld file"""
+
     # Check if it is too much data
     check_data_count(buff)
 
@@ -266,6 +496,24 @@ def fld_file_write_metadata(fh, byte_offset, x, ioh):
 
     return
 
+
+def fld_file_write_vector_metadata(fh, byte_offset, x, y, z, ioh):
+    """Function used to write metadata of a vector field to a fld file"""
+
+    buff = fld_file_vector_metadata(x, y, z, ioh)
+    fld_file_write_metadata_buffer(fh, byte_offset, buff)
+
+    return
+
+
+def fld_file_write_metadata(fh, byte_offset, x, ioh):
+    """Function used to write metadata of a scalar field to a fld file"""
+
+    buff = fld_file_metadata(x, ioh)
+    fld_file_write_metadata_buffer(fh, byte_offset, buff)
+
+    return
+
 def check_data_count(data: np.ndarray):
 
     if (np.int64(data.size) >= int32_limit): 
@@ -1,12 +1,38 @@
-""" Contains functions to wrap the ROM types to easily post process data """
+""" Contains functions to wrap the ROM types to easily post process data
+
+The reconstruction of snapshots is dominated by matrix products, which use the
+BLAS library that numpy is linked to. Its number of threads can be controlled with
+the OMP_NUM_THREADS (or MKL_NUM_THREADS, OPENBLAS_NUM_THREADS) environment variables.
+"""
 
 from .pod import POD
 from .io_help import IoHelp
+from .kernels import scatter_wavenumbers
 import numpy as np
+import scipy.fft as spfft
 import h5py
 import os
+from concurrent.futures import ThreadPoolExecutor
+from mpi4py import MPI
 from pyevtk.hl import gridToVTK
 
+try:
+    import pyfftw
+except ImportError:
+    pyfftw_available = False
+else:
+    pyfftw_available = True
+
+# Axes of a 3d field that remain after the fft in each fft_axis
+_SLICE_AXES = {0: (1, 2), 1: (0, 2), 2: (0, 1)}
+
+# Slices of the first plane of a 3d field normal to each fft_axis
+_MASS_SLICES = {
+    0: (0, slice(None), slice(None)),
+    1: (slice(None), 0, slice(None)),
+    2: (slice(None), slice(None), 0),
+}
+
 
 def get_wavenumber_slice(kappa, fft_axis):
     """
@@ -19,12 +45,9 @@ def get_wavenumber_slice(kappa, fft_axis):
     fft_axis : int
         Axis where the fft was performed
     """
-    if fft_axis == 0:
-        return (kappa, slice(None), slice(None))
-    elif fft_axis == 1:
-        return (slice(None), kappa, slice(None))
-    elif fft_axis == 2:
-        return (slice(None), slice(None), kappa)
+    wavenumber_slice = [slice(None), slice(None), slice(None)]
+    wavenumber_slice[fft_axis] = kappa
+    return tuple(wavenumber_slice)
 
 
 def get_mass_slice(fft_axis):
@@ -40,13 +63,7 @@ def get_mass_slice(fft_axis):
     """
 
     # Have a slice of the axis to perform the fft
-    if fft_axis == 0:
-        mass_slice = (0, slice(None), slice(None))
-    elif fft_axis == 1:
-        mass_slice = (slice(None), 0, slice(None))
-    elif fft_axis == 2:
-        mass_slice = (slice(None), slice(None), 0)
-    return mass_slice
+    return _MASS_SLICES[fft_axis]
 
 
 def get_2d_slice_shape(fft_axis, field_shape):
@@ -61,12 +78,67 @@ def get_2d_slice_shape(fft_axis, field_shape):
         Shape of the field in physical space
     """
 
-    if fft_axis == 0:
-        return (field_shape[1], field_shape[2])
-    elif fft_axis == 1:
-        return (field_shape[0], field_shape[2])
-    elif fft_axis == 2:
-        return (field_shape[0], field_shape[1])
+    first, second = _SLICE_AXES[fft_axis]
+    return (field_shape[first], field_shape[second])
+
+
+def build_spectrum(slabs, wavenumbers, fft_axis, spectrum_shape, dtype, out=None):
+    """
+    Put the 2d fourier coefficients of several fields and wavenumbers in a spectrum
+
+    All the coefficients are scattered at once, and the other wavenumbers are zero.
+    A spectrum can be given to be reused. In that case, it must be zero in all the
+    other wavenumbers, which can be achieved with clear_spectrum.
+
+    Parameters
+    ----------
+    slabs : np.ndarray
+        2d fourier coefficients with shape (fields, wavenumbers, 2d shape)
+    wavenumbers : list[int]
+        Wavenumbers of the coefficients
+    fft_axis : int
+        Axis where the fft was performed
+    spectrum_shape : tuple
+        Shape of the spectrum of all fields, (fields, 3d shape in fourier space)
+    dtype : np.dtype
+        Data type of the spectrum
+    out : np.ndarray, optional
+        Spectrum to fill, by default a new one is allocated
+
+    Returns
+    -------
+    np.ndarray
+        Spectrum of the fields
+    """
+
+    if isinstance(out, type(None)):
+        spectrum = np.zeros(spectrum_shape, dtype=dtype)
+    else:
+        spectrum = out
+
+    # View with the wavenumbers in the second axis, to index them directly
+    scatter_wavenumbers(np.moveaxis(spectrum, fft_axis + 1, 1), slabs, wavenumbers)
+
+    return spectrum
+
+
+def clear_spectrum(spectrum, wavenumbers, fft_axis):
+    """
+    Zero the given wavenumbers of a spectrum filled with build_spectrum
+
+    Only the wavenumbers that were filled are written, instead of the full spectrum.
+
+    Parameters
+    ----------
+    spectrum : np.ndarray
+        Spectrum of the fields
+    wavenumbers : list[int]
+        Wavenumbers to zero
+    fft_axis : int
+        Axis where the fft was performed
+    """
+
+    np.moveaxis(spectrum, fft_axis + 1, 1)[:, wavenumbers] = 0
 
 
 def fourier_normalization(N_samples):
@@ -81,6 +153,98 @@ def fourier_normalization(N_samples):
     return np.sqrt(N_samples)
 
 
+def forward_fourier_transform(
+    field_shape, fft_axis, number_of_fields=1, number_of_threads=1
+):
+    """
+    Get a function that performs the normalized fft of real 3d fields in the fft_axis
+
+    Only the positive wavenumbers are computed, since the fields are real.
+    The fields are stacked in the first axis and transformed with one call.
+    If pyfftw is available, one FFTW plan is created for the given shape and reused
+    for all the snapshots. Otherwise, scipy is used.
+
+    With pyfftw, fields allocated with empty_fft_input are transformed without
+    copying them, and their values are overwritten. The coefficients are written
+    in an output buffer that is returned, and reused, in every call.
+
+    Parameters
+    ----------
+    field_shape : tuple
+        Shape of the fields in physical space
+    fft_axis : int
+        Axis of the fields where the fft is performed
+    number_of_fields : int, optional
+        Number of fields that are transformed at once, by default 1
+    number_of_threads : int, optional
+        Number of threads used in the fft, by default 1. Consider the
+        number of ranks that run in each node when increasing it.
+
+    Returns
+    -------
+    callable
+        Function that takes an array of shape (fields, 3d shape) and returns
+        the fourier coefficients of the fields. With pyfftw, the returned array
+        is overwritten in the next call
+    """
+
+    N_samples = field_shape[fft_axis]
+    stacked_shape = (number_of_fields, *field_shape)
+
+    if pyfftw_available:
+
+        spectrum_shape = list(stacked_shape)
+        spectrum_shape[fft_axis + 1] = N_samples // 2 + 1
+
+        in_buf = pyfftw.empty_aligned(stacked_shape, dtype="float64")
+        out_buf = pyfftw.empty_aligned(tuple(spectrum_shape), dtype="complex128")
+        plan = pyfftw.FFTW(
+            in_buf,
+            out_buf,
+            axes=(fft_axis + 1,),
+            direction="FFTW_FORWARD",
+            flags=("FFTW_MEASURE", "FFTW_DESTROY_INPUT"),
+            threads=number_of_threads,
+        )
+
+        def transform(fields):
+            # Aligned fields are used as input directly, others are copied.
+            # The orthonormal scaling is applied in place in the output buffer
+            return plan(input_array=fields, ortho=True, normalise_idft=False)
+
+    else:
+
+        def transform(fields):
+            return spfft.rfft(
+                fields, axis=fft_axis + 1, norm="ortho", workers=number_of_threads
+            )
+
+    return transform
+
+
+def empty_fft_input(shape):
+    """
+    Allocate an array for real fields that are transformed with forward_fourier_transform
+
+    If pyfftw is available, the array is aligned as the FFTW plans expect,
+    so the fields are transformed without copying them.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape of the array, (fields, 3d shape)
+
+    Returns
+    -------
+    ndarray
+        Uninitialized array of doubles
+    """
+
+    if pyfftw_available:
+        return pyfftw.empty_aligned(shape, dtype="float64")
+    return np.empty(shape, dtype=np.float64)
+
+
 def degenerate_scaling(kappa):
     """
     Get the scaling factor for the degenerate wavenumbers.
@@ -100,6 +264,73 @@ def degenerate_scaling(kappa):
     return np.sqrt(scaling)
 
 
+def load_snapshot(fname, fields, out=None):
+    """
+    Load the fields of a snapshot from an hdf5 file
+
+    The fields are read directly into one array, stacked in the first axis.
+
+    Parameters
+    ----------
+    fname : str
+        Name of the file containing the snapshot
+    fields : list[str]
+        Names of the fields to load
+    out : np.ndarray, optional
+        Array of shape (fields, 3d shape) where the fields are read, by default
+        a new one is allocated. The data is converted to its data type.
+
+    Returns
+    -------
+    np.ndarray
+        The fields of the snapshot
+    """
+
+    # Use a large chunk cache, the whole fields are read
+    with h5py.File(fname, "r", rdcc_nbytes=64 * 1024 * 1024) as f:
+        if isinstance(out, type(None)):
+            out = np.empty((len(fields), *f[fields[0]].shape), dtype=np.float64)
+        for i, field in enumerate(fields):
+            f[field].read_direct(out[i])
+
+    return out
+
+
+def update_wavenumbers(pod, ioh, wavenumbers, comms, executor=None):
+    """
+    Update the POD objects of several wavenumbers with the data in their buffers
+
+    The wavenumbers are independent. If an executor is given, they are updated
+    at the same time in its threads, in which case each of them must have its own
+    communicator.
+
+    Parameters
+    ----------
+    pod : dict[int, POD]
+        Dictionary of POD objects, the int key is the wavenumber
+    ioh : dict[int, IoHelp]
+        Dictionary of IoHelp objects with the buffers, the int key is the wavenumber
+    wavenumbers : list[int]
+        List of wavenumbers to update
+    comms : dict[int, MPI.Comm]
+        Communicator used to update each wavenumber
+    executor : ThreadPoolExecutor, optional
+        Executor used to update the wavenumbers concurrently, by default None
+    """
+
+    def update(kappa):
+        pod[kappa].update(
+            comms[kappa], buff=ioh[kappa].buff[:, : (ioh[kappa].buffer_index)]
+        )
+
+    if isinstance(executor, type(None)):
+        for kappa in wavenumbers:
+            update(kappa)
+    else:
+        # Consume the iterator to wait for all updates and raise their errors
+        list(executor.map(update, wavenumbers))
+
+
 def physical_space(
     pod: dict[int, POD],
     ioh: dict[int, IoHelp],
@@ -110,6 +341,7 @@ def physical_space(
     field_names: list[str],
     N_samples: int,
     snapshots: list[int] = None,
+    dtype=None,
 ):
     """
     Function to transform modes or snapshots from the POD objects into the physical space
@@ -145,11 +377,33 @@ def physical_space(
         If this option is given, then the return will be a list of snapshots in physical space
         using the snapshot indices for the reconstruction.
         Be mindfull that the snapshot indices should be in the range of the snapshots used to create the POD objects.
+    dtype : np.dtype, optional
+        Data type used to reconstruct the fourier coefficients of the snapshots, by default None.
+        If None, the data type of the modes is used. A lower precision, e.g., np.complex64,
+        halves the memory traffic of the reconstruction. The inverse fft is always performed
+        in the precision of the modes. It must be a complex data type, otherwise a
+        ValueError is raised.
 
     Returns
     -------
     """
 
+    if not isinstance(dtype, type(None)) and not np.issubdtype(
+        np.dtype(dtype), np.complexfloating
+    ):
+        raise ValueError(
+            "The reconstruction data type must be complex, the modes are complex"
+        )
+
+    # Shape of the positive half of the spectrum of all the fields.
+    # The negative wavenumbers are the complex conjugates, so irfft fills them
+    spectrum_shape = list(field_shape)
+    spectrum_shape[fft_axis] = N_samples // 2 + 1
+    spectrum_shape = (len(field_names), *spectrum_shape)
+
+    # Shape of the fourier coefficients of one wavenumber
+    _2d_field_shape = get_2d_slice_shape(fft_axis, field_shape)
+
     # To reconstruct snapshots
     if isinstance(snapshots, list):
 
@@ -158,65 +412,89 @@ def physical_space(
         # Reconstruct the fourier coefficients per wavenumber with the given snapshots and modes
         fourier_reconstruction = {}
         for kappa in wavenumbers:
-            fourier_reconstruction[kappa] = (
-                pod[kappa].u_1t[:, modes].reshape(-1, len(modes))
-                @ np.diag(pod[kappa].d_1t[modes])
-                @ pod[kappa]
+            if isinstance(dtype, type(None)):
+                u_dtype = pod[kappa].u_1t.dtype
+                vt_dtype = pod[kappa].vt_1t.dtype
+            else:
+                u_dtype = dtype
+                vt_dtype = dtype
+
+            # Scale the columns of the modes instead of multiplying by a diagonal
+            # matrix, so only one matrix product is needed. The data is cast
+            # before scaling it, so no copy is made in the original precision
+            us = (
+                pod[kappa]
+                .u_1t[:, modes]
+                .reshape(-1, len(modes))
+                .astype(u_dtype, copy=False)
+            )
+            us *= pod[kappa].d_1t[modes].astype(u_dtype)[np.newaxis, :]
+            vt = np.ascontiguousarray(
+                pod[kappa]
                 .vt_1t[np.ix_(modes, snapshots)]
-                .reshape(len(modes), len(snapshots))
+                .reshape(len(modes), len(snapshots)),
+                dtype=vt_dtype,
             )
+            # Compute the transpose, so that each snapshot is a contiguous row
+            fourier_reconstruction[kappa] = vt.T @ us.T
+
+        # Buffers reused for all the snapshots. Only the given wavenumbers
+        # are written in the spectrum, and they are zeroed after each use
+        slabs = np.empty(
+            (len(field_names), len(wavenumbers), *_2d_field_shape),
+            dtype=pod[0].u_1t.dtype,
+        )
+        fourier_field_3d = np.zeros(spectrum_shape, dtype=pod[0].u_1t.dtype)
 
         # Go thorugh the wavenumbers in the list and put the modes in the physical space
         for snap_id, snapshot in enumerate(snapshots):
 
             physical_fields[snapshot] = {}
 
-            # Create a buffer to zero out all the other wavenumber contributions
-            fourier_field_3d = [
-                np.zeros(field_shape, dtype=pod[0].u_1t.dtype)
-                for i in range(0, len(field_names))
-            ]
+            # Gather the contributions of the wavenumbers
+            for k, kappa in enumerate(wavenumbers):
 
-            # Fill the fourier fields with the contributions of the wavenumbers
-            for kappa in wavenumbers:
-
-                ## Split the 1d snapshot into a list with the fields you want
-                field_list1d = ioh[kappa].split_narray_to_1dfields(
-                    fourier_reconstruction[kappa][:, snap_id]
+                ## View the 1d snapshot as the 2d fields you want
+                slabs[:, k] = ioh[kappa].split_narray_to_field_view(
+                    fourier_reconstruction[kappa][snap_id], _2d_field_shape
                 )
-                ## Reshape the obtained 1d fields to be 2d
-                _2d_field_shape = get_2d_slice_shape(fft_axis, field_shape)
-                field_list_2d = [
-                    field.reshape(_2d_field_shape) for field in field_list1d
-                ]
-
-                # Get the proper data slice for positive and negative wavenumber
-                positive_wavenumber_slice = get_wavenumber_slice(kappa, fft_axis)
-                negative_wavenumber_slice = get_wavenumber_slice(-kappa, fft_axis)
 
-                for i, field_name in enumerate(field_names):
+            # Fill the fourier fields with the contributions of the wavenumbers,
+            # all the other wavenumbers are zero
+            build_spectrum(
+                slabs,
+                wavenumbers,
+                fft_axis,
+                spectrum_shape,
+                pod[0].u_1t.dtype,
+                out=fourier_field_3d,
+            )
 
-                    # Fill the buffer with the proper wavenumber contribution
-                    fourier_field_3d[i][positive_wavenumber_slice] = field_list_2d[i]
-                    if kappa != 0:
-                        fourier_field_3d[i][negative_wavenumber_slice] = np.conj(
-                            field_list_2d[i]
-                        )
+            # Perform the inverse fft of all the fields at once.
+            # The result is real, since the spectrum is hermitian, and the
+            # orthonormal scaling rescales the coefficients
+            physical_field_3d = np.fft.irfft(
+                fourier_field_3d, n=N_samples, axis=fft_axis + 1, norm="ortho"
+            )
+            clear_spectrum(fourier_field_3d, wavenumbers, fft_axis)
 
             for i, field_name in enumerate(field_names):
 
-                # Perform the inverse fft
-                physical_field_3d = np.fft.ifft(
-                    fourier_field_3d[i] * fourier_normalization(N_samples),
-                    axis=fft_axis,
-                )  # Rescale the coefficients
-
-                # Save the field in the dictionary (only the real part)
-                physical_fields[snapshot][field_name] = np.copy(physical_field_3d.real)
+                # Save the field in the dictionary. It is a contiguous view,
+                # as needed to write it to vtk, so no copy is made
+                physical_fields[snapshot][field_name] = np.ascontiguousarray(
+                    physical_field_3d[i]
+                )
 
     # To obtain only the modes
     else:
 
+        # Buffer reused for all the modes. Only one wavenumber is written
+        # in it at a time, and it is zeroed after each use
+        fourier_field_3d = np.zeros(
+            spectrum_shape, dtype=pod[wavenumbers[0]].u_1t.dtype
+        )
+
         # Go thorugh the wavenumbers in the list and put the modes in the physical space
         physical_fields = {}
         for kappa in wavenumbers:
@@ -229,43 +507,36 @@ def physical_space(
                 # Add the mode to the dictionary
                 physical_fields[kappa][mode] = {}
 
-                ## Split the 1d snapshot into a list with the fields you want
-                field_list1d = ioh[kappa].split_narray_to_1dfields(
-                    pod[kappa].u_1t[:, mode]
+                ## View the 1d mode as the 2d fields you want
+                slabs = ioh[kappa].split_narray_to_field_view(
+                    pod[kappa].u_1t[:, mode], _2d_field_shape
                 )
-                ## Reshape the obtained 1d fields to be 2d
-                _2d_field_shape = get_2d_slice_shape(fft_axis, field_shape)
-                field_list_2d = [
-                    field.reshape(_2d_field_shape) for field in field_list1d
-                ]
 
-                # Get the proper data slice for positive and negative wavenumber
-                positive_wavenumber_slice = get_wavenumber_slice(kappa, fft_axis)
-                negative_wavenumber_slice = get_wavenumber_slice(-kappa, fft_axis)
+                # Fill the buffer with the proper wavenumber contribution,
+                # all the other wavenumbers are zero
+                build_spectrum(
+                    slabs[:, np.newaxis],
+                    [kappa],
+                    fft_axis,
+                    spectrum_shape,
+                    pod[kappa].u_1t.dtype,
+                    out=fourier_field_3d,
+                )
 
-                for i, field_name in enumerate(field_names):
+                # Perform the inverse fft of all the fields at once.
+                # The result is real, since the spectrum is hermitian, and the
+                # orthonormal scaling rescales the coefficients
+                physical_field_3d = np.fft.irfft(
+                    fourier_field_3d, n=N_samples, axis=fft_axis + 1, norm="ortho"
+                )
+                clear_spectrum(fourier_field_3d, [kappa], fft_axis)
 
-                    # Create a buffer to zero out all the other wavenumber contributions
-                    fourier_field_3d = np.zeros(
-                        field_shape, dtype=pod[kappa].u_1t.dtype
-                    )
+                for i, field_name in enumerate(field_names):
 
-                    # Fill the buffer with the proper wavenumber contribution
-                    fourier_field_3d[positive_wavenumber_slice] = field_list_2d[i]
-                    if kappa != 0:
-                        fourier_field_3d[negative_wavenumber_slice] = np.conj(
-                            field_list_2d[i]
-                        )
-
-                    # Perform the inverse fft
-                    physical_field_3d = np.fft.ifft(
-                        fourier_field_3d * fourier_normalization(N_samples),
-                        axis=fft_axis,
-                    )  # Rescale the coefficients
-
-                    # Save the field in the dictionary (only the real part)
-                    physical_fields[kappa][mode][field_name] = np.copy(
-                        physical_field_3d.real
+                    # Save the field in the dictionary. It is a contiguous view,
+                    # as needed to write it to vtk, so no copy is made
+                    physical_fields[kappa][mode][field_name] = np.ascontiguousarray(
+                        physical_field_3d[i]
                     )
 
     return physical_fields
@@ -280,6 +551,7 @@ def pod_fourier_1_homogenous_direction(
     k: int,
     p: int,
     fft_axis: int,
+    number_of_threads: int = 1,
 ) -> tuple:
     """
     Perform POD on a sequence of snapshot while applying fft in an homogenous direction of choice.
@@ -310,6 +582,12 @@ def pod_fourier_1_homogenous_direction(
     fft_axis : int
         Axis to perform the fft on.
         0 for x, 1 for y, 2 for z. (Although this depends on how the mesh was created)
+    number_of_threads : int, optional
+        Number of threads used to update the POD of different wavenumbers at the same time,
+        by default 1. This requires MPI to support multiple threads.
+        The same number of threads is used in the fft of the snapshots.
+        Consider reducing the threads of the BLAS library accordingly,
+        and the number of ranks that run in each node.
 
     Returns
     -------
@@ -333,7 +611,8 @@ def pod_fourier_1_homogenous_direction(
     # Load the mass matrix
     with h5py.File(mass_matrix_fname, "r") as f:
         bm = f[mass_matrix_key][:]
-    bm[np.where(bm == 0)] = 1e-14
+    # Avoid zero weights, the modes are later divided by their square root
+    np.maximum(bm, 1e-14, out=bm)
     field_3d_shape = bm.shape
 
     # Obtain the number of frequencies you will obtain
@@ -342,6 +621,23 @@ def pod_fourier_1_homogenous_direction(
     # Choose the proper mass matrix slice
     bm = bm[get_mass_slice(fft_axis)]
 
+    # The shape is the same for all snapshots, so the fft is set up once
+    fourier_transform = forward_fourier_transform(
+        field_3d_shape,
+        fft_axis,
+        number_of_fields=number_of_pod_fields,
+        number_of_threads=number_of_threads,
+    )
+
+    # Scaling of each wavenumber due to the symmetries of the spectrum
+    wavenumber_scaling = np.array(
+        [degenerate_scaling(kappa) for kappa in range(0, number_of_frequencies)]
+    )
+
+    # Put the mass matrix in the appropiate format (long 1d array).
+    # It is the same for all the wavenumbers, so it is computed once
+    bm1sqrt = np.tile(np.sqrt(bm).reshape(-1), number_of_pod_fields)
+
     ioh = {"wavenumber": "buffers"}
     pod = {"wavenumber": "POD object"}
 
@@ -359,66 +655,102 @@ def pod_fourier_1_homogenous_direction(
             module_name="buffer_kappa" + str(kappa),
         )
 
-        # Put the mass matrix in the appropiate format (long 1d array)
-        mass_list = []
-        for i in range(0, number_of_pod_fields):
-            mass_list.append(np.copy(np.sqrt(bm)))
-        ioh[kappa].copy_fieldlist_to_xi(mass_list)
-        ioh[kappa].bm1sqrt[:, :] = np.copy(ioh[kappa].xi[:, :])
+        # Copy the mass matrix directly, the snapshot buffer xi is complex
+        ioh[kappa].bm1sqrt[:, 0] = bm1sqrt
 
         # Instance the POD object
         pod[kappa] = POD(
             comm, number_of_modes_to_update=k, global_updates=True, auto_expand=False
         )
 
+    # The wavenumbers can be updated concurrently if MPI allows it.
+    # Each of them then uses its own communicator
+    if number_of_threads > 1 and MPI.Query_thread() < MPI.THREAD_MULTIPLE:
+        ioh[0].log.write(
+            "warning",
+            "MPI does not support multiple threads, updating wavenumbers serially",
+        )
+        number_of_threads = 1
+    if number_of_threads > 1:
+        executor = ThreadPoolExecutor(max_workers=number_of_threads)
+        kappa_comm = {kappa: comm.Dup() for kappa in range(0, number_of_frequencies)}
+    else:
+        executor = None
+        kappa_comm = {kappa: comm for kappa in range(0, number_of_frequencies)}
+
     # ============
     # Main program
     # ============
     # Update modes
     # ============
 
-    j = 0
-    while j < len(file_sequence):
-
-        # Load the snapshot data
-        fname = file_sequence[j]
-        with h5py.File(fname, "r") as f:
-            fld_data = []
-            for field in pod_fields:
-                fld_data.append(f[field][:])
-
-        # Perform the fft
-        for i in range(0, number_of_pod_fields):
-            fld_data[i] = np.fft.fft(
-                fld_data[i], axis=fft_axis
-            ) / fourier_normalization(N_samples)
-
-        # For each wavenumber, load buffers and update if needed
-        for kappa in range(0, number_of_frequencies):
-
-            # Get the proper slice for the wavenumber
-            positive_wavenumber_slice = get_wavenumber_slice(kappa, fft_axis)
-
-            # Get the wavenumber data
-            wavenumber_data = []
-            for i in range(0, number_of_pod_fields):
-                wavenumber_data.append(
-                    fld_data[i][positive_wavenumber_slice] * degenerate_scaling(kappa)
+    # The next snapshot is read in the background while the current one
+    # is processed. Two buffers are alternated, one is read while the
+    # other one is transformed. They are read directly as the fft input
+    snapshot_buffers = [
+        empty_fft_input((number_of_pod_fields, *field_3d_shape)) for _ in range(0, 2)
+    ]
+    prefetch_executor = ThreadPoolExecutor(max_workers=1)
+
+    # The threads and communicators are released even if something fails
+    try:
+        if len(file_sequence) > 0:
+            prefetch = prefetch_executor.submit(
+                load_snapshot, file_sequence[0], pod_fields, out=snapshot_buffers[0]
+            )
+
+        j = 0
+        while j < len(file_sequence):
+
+            # Load the snapshot data
+            snapshot_data = prefetch.result()
+            if j + 1 < len(file_sequence):
+                prefetch = prefetch_executor.submit(
+                    load_snapshot,
+                    file_sequence[j + 1],
+                    pod_fields,
+                    out=snapshot_buffers[(j + 1) % 2],
+                )
+
+            # Perform the fft of all the fields at once. The data is real,
+            # so only the positive wavenumbers are computed
+            fld_data = fourier_transform(snapshot_data)
+
+            # Have the wavenumbers in the second axis, to index them directly
+            fld_data = np.moveaxis(fld_data, fft_axis + 1, 1)
+
+            # For each wavenumber, load buffers and see if they must be updated
+            kappas_to_update = []
+            for kappa in range(0, number_of_frequencies):
+
+                # Get the wavenumber data of all the fields
+                wavenumber_data = (
+                    fld_data[:, kappa] * wavenumber_scaling[kappa]
                 )  # Here add contributions from negative wavenumbers
 
-            # Put the fourier snapshot data into a column array
-            ioh[kappa].copy_fieldlist_to_xi(wavenumber_data)
+                # Put the fourier snapshot data into a column array
+                ioh[kappa].copy_fieldlist_to_xi(wavenumber_data)
+
+                # Load the column array into the buffer
+                ioh[kappa].load_buffer(scale_snapshot=True)
 
-            # Load the column array into the buffer
-            ioh[kappa].load_buffer(scale_snapshot=True)
+                if ioh[kappa].update_from_buffer:
+                    kappas_to_update.append(kappa)
 
             # Update POD modes
-            if ioh[kappa].update_from_buffer:
-                pod[kappa].update(
-                    comm, buff=ioh[kappa].buff[:, : (ioh[kappa].buffer_index)]
-                )
+            update_wavenumbers(
+                pod, ioh, kappas_to_update, kappa_comm, executor=executor
+            )
+
+            j += 1
 
-        j += 1
+    finally:
+        # Do not start reading snapshots that will not be used
+        prefetch_executor.shutdown(cancel_futures=True)
+        if not isinstance(executor, type(None)):
+            executor.shutdown()
+            for kappa in range(0, number_of_frequencies):
+                kappa_comm[kappa].Free()
 
     # ============
     # Main program
@@ -455,7 +787,7 @@ def pod_fourier_1_homogenous_direction(
         pod[kappa].scale_modes(comm, bm1sqrt=ioh[kappa].bm1sqrt, op="div")
 
         # Scale back the modes (with wavenumbers and degeneracy)
-        pod[kappa].u_1t = pod[kappa].u_1t / degenerate_scaling(kappa)
+        pod[kappa].u_1t = pod[kappa].u_1t / wavenumber_scaling[kappa]
 
         # Rotate local modes back to global, This only enters in effect if global_update = false
         pod[kappa].rotate_local_modes_to_global(comm)
@@ -463,6 +795,22 @@ def pod_fourier_1_homogenous_direction(
     return pod, ioh, field_3d_shape, number_of_frequencies, N_samples
 
 
+def _split_fname(fname):
+    """
+    Split a file name into its path, prefix and extension
+
+    :meta private:
+    """
+
+    path = os.path.dirname(fname)
+    if path == "":
+        path = "."
+    prefix = os.path.basename(fname).split(".")[0]
+    extension = os.path.basename(fname).split(".")[1]
+
+    return path, prefix, extension
+
+
 def write_3dfield_to_file(
     fname: str,
     x: np.ndarray,
@@ -522,78 +870,82 @@ def write_3dfield_to_file(
     None
     """
 
-    # Always iterate over the wavenumbers or snapshots to not be too harsh on memory
-    # Write a reconstruction to vtk
-    if isinstance(snapshots, list):
+    # Check the extension and path of the file
+    path, prefix, extension = _split_fname(fname)
+    outname_prefix = f"{path}/{prefix}"
 
-        for snapshot in snapshots:
-            # Fetch the data for this mode and wavenumber
-            reconstruction_dict = physical_space(
-                pod,
-                ioh,
-                wavenumbers,
-                modes,
-                field_shape,
-                fft_axis,
-                field_names,
-                N_samples,
-                snapshots=[snapshot],
-            )
+    # The files are written in the background while the next field is computed.
+    # Only one write is pending at a time, to not hold many fields in memory
+    writer = ThreadPoolExecutor(max_workers=1)
+    pending = []
 
-            # Write 3d_field
-            sufix = f"reconstructed_data_{snapshot}"
-
-            # Check the extension and path of the file
-            ## Path
-            path = os.path.dirname(fname)
-            if path == "":
-                path = "."
-            ## prefix
-            prefix = os.path.basename(fname).split(".")[0]
-            ## Extension
-            extension = os.path.basename(fname).split(".")[1]
-
-            if (extension == "vtk") or (extension == "vts"):
-                outname = f"{path}/{prefix}_{sufix}"
-                print(f"Writing {outname}")
-                gridToVTK(outname, x, y, z, pointData=reconstruction_dict[snapshot])
-
-    # Write modes to vtk
-    else:
+    def write_vtk(outname, point_data):
+        if len(pending) > 0:
+            pending.pop().result()
+        pending.append(
+            writer.submit(gridToVTK, outname, x, y, z, pointData=point_data)
+        )
 
-        for kappa in wavenumbers:
-            for mode in modes:
+    try:
+        # Always iterate over the wavenumbers or snapshots to not be too harsh on memory
+        # Write a reconstruction to vtk
+        if isinstance(snapshots, list):
 
+            for snapshot in snapshots:
                 # Fetch the data for this mode and wavenumber
-                mode_dict = physical_space(
+                reconstruction_dict = physical_space(
                     pod,
                     ioh,
-                    [kappa],
-                    [mode],
+                    wavenumbers,
+                    modes,
                     field_shape,
                     fft_axis,
                     field_names,
                     N_samples,
-                    snapshots,
+                    snapshots=[snapshot],
                 )
 
-                # Write 3D field
-                sufix = f"kappa_{kappa}_mode{mode}.vtk"
-
-                # Check the extension and path of the file
-                ## Path
-                path = os.path.dirname(fname)
-                if path == "":
-                    path = "."
-                ## prefix
-                prefix = os.path.basename(fname).split(".")[0]
-                ## Extension
-                extension = os.path.basename(fname).split(".")[1]
+                # Write 3d_field
+                sufix = f"reconstructed_data_{snapshot}"
 
                 if (extension == "vtk") or (extension == "vts"):
-                    outname = f"{path}/{prefix}_{sufix}"
+                    outname = f"{outname_prefix}_{sufix}"
                     print(f"Writing {outname}")
-                    gridToVTK(outname, x, y, z, pointData=mode_dict[kappa][mode])
+                    write_vtk(outname, reconstruction_dict[snapshot])
+
+        # Write modes to vtk
+        else:
+
+            for kappa in wavenumbers:
+                for mode in modes:
+
+                    # Fetch the data for this mode and wavenumber
+                    mode_dict = physical_space(
+                        pod,
+                        ioh,
+                        [kappa],
+                        [mode],
+                        field_shape,
+                        fft_axis,
+                        field_names,
+                        N_samples,
+                        snapshots,
+                    )
+
+                    # Write 3D field
+                    sufix = f"kappa_{kappa}_mode{mode}.vtk"
+
+                    if (extension == "vtk") or (extension == "vts"):
+                        outname = f"{outname_prefix}_{sufix}"
+                        print(f"Writing {outname}")
+                        write_vtk(outname, mode_dict[kappa][mode])
+
+        # Wait for the last write
+        if len(pending) > 0:
+            pending.pop().result()
+
+    finally:
+        writer.shutdown()
 
 
 def save_pod_state(fname: str, pod: dict[int, POD]):
@@ -609,11 +961,7 @@ def save_pod_state(fname: str, pod: dict[int, POD]):
         the int key is the wavenumber
     """
 
-    path = os.path.dirname(fname)
-    if path == "":
-        path = "."
-    prefix = os.path.basename(fname).split(".")[0]
-    extension = os.path.basename(fname).split(".")[1]
+    path, prefix, extension = _split_fname(fname)
 
     f = h5py.File(f"{prefix}_modes.{extension}", "w")
     for kappa in pod.keys():
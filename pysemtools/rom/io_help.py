@@ -11,7 +11,11 @@ NoneType = type(None)
 
 class IoHelp:
     """Class used to help with IO operations.
-    It contains buffers to be used in the carrying out of the POD"""
+    It contains buffers to be used in the carrying out of the POD
+
+    A snapshot has the fields one after the other, each of them
+    flattened, so field i is in positions i * field_size to
+    (i + 1) * field_size."""
 
     def __init__(
         self,
@@ -85,6 +89,13 @@ class IoHelp:
 
         return field_list1d
 
+    def split_narray_to_field_view(self, array, field_shape):
+        """Get a view of a snapshot with shape (number_of_fields, *field_shape).
+        This gives the same fields as split_narray_to_1dfields, but without
+        copying them"""
+
+        return array.reshape((self.number_of_fields, *field_shape))
+
     def load_buffer(self, scale_snapshot=True):
         """Function to load snapshot into the allocated buffer.
         It is this buffer that is given to SVD in the calculation of POD"""
@@ -0,0 +1,54 @@
+"""Compiled kernels used to move fourier coefficients in and out of spectra"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    numba_available = False
+else:
+    numba_available = True
+
+
+def scatter_wavenumbers(spectrum, slabs, wavenumbers):
+    """
+    Copy the 2d fourier coefficients of several fields and wavenumbers into a spectrum.
+
+    Parameters
+    ----------
+    spectrum : ndarray
+        Spectrum of shape (fields, all wavenumbers, n0, n1) where the data is copied.
+        It can be a strided view, e.g., with the fft axis moved to the second position.
+    slabs : ndarray
+        Fourier coefficients of shape (fields, wavenumbers, n0, n1).
+    wavenumbers : list[int]
+        Wavenumbers of the spectrum where each slab is copied.
+
+    Notes
+    -----
+    If numba is available, each pair of field and wavenumber is copied
+    in parallel by a compiled kernel. Otherwise, the same copy is performed
+    with one indexed numpy assignment.
+    """
+
+    if numba_available and spectrum.dtype == slabs.dtype:
+        _scatter_wavenumbers_numba(
+            spectrum, slabs, np.asarray(wavenumbers, dtype=np.int64)
+        )
+    else:
+        spectrum[:, wavenumbers] = slabs
+
+
+if numba_available:
+
+    @njit(parallel=True, cache=True)
+    def _scatter_wavenumbers_numba(spectrum, slabs, wavenumbers):
+        """Copy the slabs of the fields and wavenumbers, one slab per thread"""
+
+        nfields = slabs.shape[0]
+        nk = slabs.shape[1]
+
+        for fk in prange(nfields * nk):
+            f = fk // nk
+            k = fk % nk
+            spectrum[f, wavenumbers[k]] = slabs[f, k]
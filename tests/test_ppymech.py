@@ -12,7 +12,7 @@ comm = MPI.COMM_WORLD
 # Import general modules
 import numpy as np
 # Import relevant modules
-from pysemtools.io.ppymech.neksuite import preadnek, pwritenek
+from pysemtools.io.ppymech.neksuite import preadnek, pwritenek, preadnek_arrays, NekReader
 from pymech.neksuite import readnek, writenek
 
 NoneType = type(None)
@@ -139,3 +139,53 @@ def test_write_single():
       
     assert passed
 
+#==============================================================================
+
+def test_read_arrays():
+
+    # Read the original mesh data
+    fname = 'examples/data/rbc0.f00001'
+    fields = preadnek_arrays(fname, comm)
+    data_pymech = readnek(fname)
+
+    passed = True
+    for e in range(data_pymech.nel):
+
+        t1 = np.allclose(fields["pos"][e], data_pymech.elem[e].pos)
+        t2 = np.allclose(fields["vel"][e], data_pymech.elem[e].vel)
+        t3 = np.allclose(fields["pres"][e], data_pymech.elem[e].pres)
+        t4 = np.allclose(fields["temp"][e], data_pymech.elem[e].temp)
+
+        passed = np.all([t1, t2, t3, t4])
+
+        if not passed:
+            break
+
+    assert passed
+
+#==============================================================================
+
+def test_nek_reader():
+
+    # Read the same file twice with the same reader
+    fname = 'examples/data/rbc0.f00001'
+    data_pymech = readnek(fname)
+
+    with NekReader(comm) as reader:
+        data_pynek = reader.read(fname)
+        fields = reader.read_arrays(fname)
+
+    passed = True
+    for e in range(data_pymech.nel):
+
+        t1 = np.allclose(data_pynek.elem[e].vel, data_pymech.elem[e].vel)
+        t2 = np.allclose(fields["vel"][e], data_pymech.elem[e].vel)
+        t3 = np.allclose(data_pynek.elem[e].temp, data_pymech.elem[e].temp)
+        t4 = np.allclose(fields["temp"][e], data_pymech.elem[e].temp)
+
+        passed = np.all([t1, t2, t3, t4])
+
+        if not passed:
+            break
+
+    assert passed
@@ -7,9 +7,18 @@ import sys
 
 # Import general modules
 import numpy as np
+import pytest
 # Import relevant modules
 from pysemtools.rom.pod import POD
 from pysemtools.rom.io_help import IoHelp
+from pysemtools.rom import kernels
+from pysemtools.rom.fft_pod_wrappers import (
+    empty_fft_input,
+    forward_fourier_transform,
+    pod_fourier_1_homogenous_direction,
+    physical_space,
+    write_3dfield_to_file,
+)
 
 def test_POD():
 
@@ -92,4 +101,216 @@ def test_POD():
 
     assert passed
 
-test_POD()
\ No newline at end of file
+test_POD()
+
+def write_fft_snapshots(path, field_shape, number_of_snapshots):
+    """Write a mass matrix and random snapshots of two fields to hdf5 files"""
+
+    import h5py
+
+    rng = np.random.default_rng(0)
+    bm = rng.random(field_shape) + 0.1
+    snapshots = []
+    with h5py.File(f"{path}/bm.h5", "w") as f:
+        f.create_dataset("bm", data=bm)
+    for j in range(0, number_of_snapshots):
+        snapshot = {
+            "u": rng.standard_normal(field_shape),
+            "v": rng.standard_normal(field_shape),
+        }
+        with h5py.File(f"{path}/snapshot{j}.h5", "w") as f:
+            for name, data in snapshot.items():
+                f.create_dataset(name, data=data)
+        snapshots.append(snapshot)
+
+    return bm, snapshots
+
+
+def test_POD_fourier(tmp_path):
+
+    if comm.Get_size() > 1:
+        sys.exit("This test is not parallelized")
+
+    field_shape = (5, 6, 4)
+    field_names = ["u", "v"]
+    number_of_snapshots = 6
+
+    for fft_axis in range(0, 3):
+
+        path = tmp_path / f"axis{fft_axis}"
+        path.mkdir()
+        bm, snapshots = write_fft_snapshots(path, field_shape, number_of_snapshots)
+        file_sequence = [f"{path}/snapshot{j}.h5" for j in range(number_of_snapshots)]
+
+        # Update the modes in batches, keeping all of them
+        pod, ioh, shape, number_of_frequencies, N_samples = (
+            pod_fourier_1_homogenous_direction(
+                comm,
+                file_sequence,
+                field_names,
+                f"{path}/bm.h5",
+                "bm",
+                number_of_snapshots,
+                4,
+                fft_axis,
+            )
+        )
+        assert shape == field_shape
+        assert N_samples == field_shape[fft_axis]
+        assert number_of_frequencies == N_samples // 2 + 1
+
+        # Reference: svd of the weighted fourier coefficients of each wavenumber
+        bm_sqrt = np.sqrt(np.take(bm, 0, axis=fft_axis)).reshape(-1)
+        bm_sqrt = np.tile(bm_sqrt, len(field_names))
+        coefficients = [
+            np.moveaxis(
+                np.fft.rfft(
+                    np.stack([s[name] for name in field_names]),
+                    axis=fft_axis + 1,
+                    norm="ortho",
+                ),
+                fft_axis + 1,
+                1,
+            )
+            for s in snapshots
+        ]
+        for kappa in range(0, number_of_frequencies):
+            scaling = 1 if kappa == 0 else np.sqrt(2)
+            S = np.stack([c[:, kappa].reshape(-1) for c in coefficients], axis=1)
+            u_ref, d_ref, _ = np.linalg.svd(
+                S * bm_sqrt[:, np.newaxis] * scaling, full_matrices=False
+            )
+
+            assert np.allclose(pod[kappa].d_1t, d_ref)
+
+            # The modes are unique up to a complex phase
+            u = pod[kappa].u_1t * bm_sqrt[:, np.newaxis] * scaling
+            overlap = np.abs(np.sum(np.conj(u_ref) * u, axis=0))
+            assert np.allclose(overlap, 1)
+
+        # Reconstruct the snapshots with all the modes and wavenumbers
+        wavenumbers = list(range(0, number_of_frequencies))
+        modes = list(range(0, number_of_snapshots))
+        reconstruction = physical_space(
+            pod,
+            ioh,
+            wavenumbers,
+            modes,
+            field_shape,
+            fft_axis,
+            field_names,
+            N_samples,
+            snapshots=modes,
+        )
+        for j in modes:
+            for name in field_names:
+                assert reconstruction[j][name].shape == field_shape
+                assert np.allclose(reconstruction[j][name], snapshots[j][name])
+
+        # Modes in physical space are real and have the shape of the fields
+        physical_modes = physical_space(
+            pod,
+            ioh,
+            [0, number_of_frequencies - 1],
+            [0, 1],
+            field_shape,
+            fft_axis,
+            field_names,
+            N_samples,
+        )
+        for kappa in [0, number_of_frequencies - 1]:
+            for mode in [0, 1]:
+                for name in field_names:
+                    field = physical_modes[kappa][mode][name]
+                    assert field.shape == field_shape
+                    assert np.isrealobj(field)
+
+        # Write the modes and the reconstruction
+        x, y, z = np.meshgrid(
+            *(np.arange(n, dtype=np.double) for n in field_shape), indexing="ij"
+        )
+        fname = f"{path}/field.vts"
+        write_3dfield_to_file(
+            fname,
+            x,
+            y,
+            z,
+            pod,
+            ioh,
+            [0, 1],
+            [0],
+            field_shape,
+            fft_axis,
+            field_names,
+            N_samples,
+        )
+        write_3dfield_to_file(
+            fname,
+            x,
+            y,
+            z,
+            pod,
+            ioh,
+            wavenumbers,
+            modes,
+            field_shape,
+            fft_axis,
+            field_names,
+            N_samples,
+            snapshots=[0, 5],
+        )
+        written = sorted(os.listdir(path))
+        assert "field_reconstructed_data_0.vts" in written
+        assert "field_reconstructed_data_5.vts" in written
+        assert len([f for f in written if f.startswith("field_kappa")]) == 2
+
+
+def test_scatter_wavenumbers(monkeypatch):
+
+    rng = np.random.default_rng(0)
+    field_shape = (4, 5, 6)
+    wavenumbers = [0, 2, 3]
+
+    for use_numba in [kernels.numba_available, False]:
+        monkeypatch.setattr(kernels, "numba_available", use_numba)
+
+        for fft_axis in range(0, 3):
+            spectrum_shape = list(field_shape)
+            spectrum_shape[fft_axis] = 4
+            spectrum = np.zeros((2, *spectrum_shape), dtype=np.complex128)
+            reference = spectrum.copy()
+
+            slabs_shape = [n for i, n in enumerate(spectrum_shape) if i != fft_axis]
+            slabs = rng.standard_normal(
+                (2, len(wavenumbers), *slabs_shape)
+            ) + 1j * rng.standard_normal((2, len(wavenumbers), *slabs_shape))
+
+            # The spectrum is a strided view with the wavenumbers in the second axis
+            kernels.scatter_wavenumbers(
+                np.moveaxis(spectrum, fft_axis + 1, 1), slabs, wavenumbers
+            )
+            np.moveaxis(reference, fft_axis + 1, 1)[:, wavenumbers] = slabs
+
+            assert np.array_equal(spectrum, reference)
+
+
+def test_forward_fourier_transform_pyfftw():
+
+    pytest.importorskip("pyfftw")
+    import scipy.fft as spfft
+
+    rng = np.random.default_rng(0)
+    field_shape = (5, 6, 4)
+
+    for fft_axis in range(0, 3):
+        transform = forward_fourier_transform(
+            field_shape, fft_axis, number_of_fields=2, number_of_threads=2
+        )
+
+        # Aligned fields are transformed in place, others are copied first
+        for fields in [empty_fft_input((2, *field_shape)), np.empty((2, *field_shape))]:
+            for _ in range(0, 2):
+                fields[:] = rng.standard_normal((2, *field_shape))
+                reference = spfft.rfft(fields, axis=fft_axis + 1, norm="ortho")
+
+                assert np.allclose(transform(fields), reference)
@@ -0,0 +1,376 @@
+# Initialize MPI
+from mpi4py import MPI
+comm = MPI.COMM_WORLD
+
+# Import general modules
+import numpy as np
+import pytest
+
+# Import relevant modules
+from pysemtools.comm import router
+from pysemtools.comm.router import Router
+
+rank = comm.Get_rank()
+size = comm.Get_size()
+
+# The tests pass in any number of ranks. CI also runs this file with
+# mpirun -np 2 and -np 4
+
+#==============================================================================
+
+def test_gather_in_root_int():
+
+    rt = Router(comm)
+
+    # Each rank holds a different number of integers
+    local_data = np.arange(5 * (rank + 1), dtype=np.int32) + 100 * rank
+
+    recvbf, sendcounts = rt.gather_in_root(data=local_data, root=0)
+
+    assert np.all(sendcounts == 5 * (np.arange(size) + 1))
+
+    if rank == 0:
+        expected = np.concatenate(
+            [np.arange(5 * (r + 1)) + 100 * r for r in range(size)]
+        )
+        assert recvbf.dtype == np.double
+        assert np.all(recvbf == expected)
+
+        # The data type can also be kept
+        recvbf_int, _ = rt.gather_in_root(data=local_data, root=0, dtype=np.int32)
+        assert recvbf_int.dtype == np.int32
+        assert np.all(recvbf_int == expected)
+    else:
+        rt.gather_in_root(data=local_data, root=0, dtype=np.int32)
+
+#==============================================================================
+# Helpers for the send_recv tests
+
+def get_destination():
+    """Send to the next two ranks in a ring, without repeating any"""
+    return sorted(set([(rank + 1) % size, (rank + 2) % size]))
+
+def get_sources():
+    """Ranks that have this one as a destination in get_destination"""
+    return sorted(
+        set(s for s in range(size) if rank in [(s + 1) % size, (s + 2) % size])
+    )
+
+def message(source, dest, dtype, offset=0):
+    """Data that source sends to dest, a different size for each pair"""
+    count = 3 + source + 2 * dest + offset
+    return (np.arange(count) + 1000 * source + dest).astype(dtype)
+
+def list_data(dtype, offset=0):
+    return [message(rank, dest, dtype, offset) for dest in get_destination()]
+
+def get_data(dtype, broadcast, offset=0):
+    """A list with one message per destination or one array sent to all of them"""
+    if broadcast:
+        return message(rank, -1, dtype, offset)
+    return list_data(dtype, offset)
+
+def check_received(sources, recvbf, dtype, offset=0, broadcast=False):
+    assert list(sources) == get_sources()
+    assert len(recvbf) == len(sources)
+    for source, buf in zip(sources, recvbf):
+        expected = message(source, -1 if broadcast else rank, dtype, offset)
+        assert buf.dtype == np.dtype(dtype)
+        assert np.all(buf == expected)
+
+def plain_send_recv(monkeypatch, destination, data, dtype):
+    """Reference exchange with point to point messages"""
+    with monkeypatch.context() as m:
+        m.setattr(router, "small_comm_size", 0)
+        return Router(comm).send_recv(
+            destination=destination, data=data, dtype=dtype, tag=0
+        )
+
+def assert_same(result, reference):
+    sources, recvbf = result
+    ref_sources, ref_recvbf = reference
+    assert list(sources) == list(ref_sources)
+    assert len(recvbf) == len(ref_recvbf)
+    for buf, ref_buf in zip(recvbf, ref_recvbf):
+        assert buf.dtype == ref_buf.dtype
+        assert np.array_equal(buf, ref_buf)
+
+# Combinations of data that every exchange is tested with
+data_cases = [
+    (np.int32, False),
+    (np.int32, True),
+    (np.double, False),
+    (np.double, True),
+]
+
+#==============================================================================
+
+def test_send_recv_fixed_counts(monkeypatch):
+
+    for small_comm_size in [router.small_comm_size, 0]:
+        # Use the Alltoallv or the point to point exchange
+        monkeypatch.setattr(router, "small_comm_size", small_comm_size)
+        rt = Router(comm)
+
+        sources, recvbf = rt.send_recv(
+            destination=get_destination(), data=list_data(np.double), tag=0
+        )
+        check_received(sources, recvbf, np.double)
+
+        # Same counts, the exchange of the counts is skipped
+        data = [d + 0.5 for d in list_data(np.double)]
+        sources, recvbf = rt.send_recv(
+            destination=get_destination(), data=data, tag=0, fixed_counts=True
+        )
+        assert list(sources) == get_sources()
+        for source, buf in zip(sources, recvbf):
+            assert np.all(buf == message(source, rank, np.double) + 0.5)
+
+        # Changing the counts needs the exchange
+        sources, recvbf = rt.send_recv(
+            destination=get_destination(), data=list_data(np.double, 2), tag=0
+        )
+        check_received(sources, recvbf, np.double, 2)
+
+        # Claiming fixed counts after changing them is an error
+        with pytest.raises(ValueError):
+            rt.send_recv(
+                destination=get_destination(),
+                data=list_data(np.double, 4),
+                tag=0,
+                fixed_counts=True,
+            )
+
+#==============================================================================
+
+@pytest.mark.parametrize("dtype, broadcast", data_cases)
+def test_send_recv_graph(monkeypatch, dtype, broadcast):
+
+    rt = Router(comm)
+    rt.set_graph(destinations=get_destination())
+
+    # The counts change between calls, only the neighbours exchange them
+    for offset in [0, 2, 2, 0]:
+        data = get_data(dtype, broadcast, offset)
+        result = rt.send_recv(destination=get_destination(), data=data, tag=0)
+        check_received(*result, dtype, offset, broadcast)
+        assert_same(result, plain_send_recv(monkeypatch, get_destination(), data, dtype))
+
+    # The sources can also be given
+    rt.set_graph(destinations=get_destination(), sources=get_sources())
+    data = get_data(dtype, broadcast)
+    result = rt.send_recv(destination=get_destination(), data=data, tag=0)
+    assert_same(result, plain_send_recv(monkeypatch, get_destination(), data, dtype))
+
+    # Sending to a rank outside of the graph is an error
+    if size >= 4:
+        with pytest.raises(ValueError):
+            rt.send_recv(
+                destination=[(rank + 3) % size], data=[message(rank, 0, dtype)], tag=0
+            )
+
+    # Without the graph, the counts are exchanged with everyone again
+    rt.set_graph(destinations=None)
+    result = rt.send_recv(destination=get_destination(), data=data, tag=0)
+    assert_same(result, plain_send_recv(monkeypatch, get_destination(), data, dtype))
+
+#==============================================================================
+
+@pytest.mark.parametrize("dtype, broadcast", data_cases)
+def test_send_recv_persistent(monkeypatch, dtype, broadcast):
+
+    rt = Router(comm)
+    destination = get_destination()
+
+    # Get the pattern with a first exchange
+    sendbuf = get_data(dtype, broadcast)
+    sources, recvbf = rt.send_recv(destination=destination, data=sendbuf, tag=0)
+    recvbuf = [np.empty_like(buf) for buf in recvbf]
+    key = rt.plan(
+        destination=destination, sendbuf=sendbuf, source=sources, recvbuf=recvbuf
+    )
+
+    # Restart the requests with new data in the same buffers
+    for value in [1, 2]:
+        if broadcast:
+            sendbuf[:] = get_data(dtype, broadcast) + value
+        else:
+            for buf, new in zip(sendbuf, get_data(dtype, broadcast)):
+                buf[:] = new + value
+        result = rt.send_recv_persistent()
+        reference = plain_send_recv(monkeypatch, destination, sendbuf, dtype)
+        assert_same((sources, result), reference)
+
+    # The same plan is given back for the same buffers
+    assert rt.plan(
+        destination=destination, sendbuf=sendbuf, source=sources, recvbuf=recvbuf
+    ) == key
+    assert len(rt._plans) == 1
+
+
+def test_send_recv_persistent_eviction(monkeypatch):
+
+    monkeypatch.setattr(router, "max_cached_plans", 2)
+    rt = Router(comm)
+    destination = get_destination()
+    sendbuf = list_data(np.double)
+    sources, recvbf = rt.send_recv(destination=destination, data=sendbuf, tag=0)
+
+    # Three plans with different recieve buffers
+    recvbufs = [[np.empty_like(buf) for buf in recvbf] for _ in range(0, 3)]
+    keys = [
+        rt.plan(destination=destination, sendbuf=sendbuf, source=sources, recvbuf=buf)
+        for buf in recvbufs
+    ]
+
+    # Only the last two are kept
+    assert len(rt._plans) == 2
+    with pytest.raises(ValueError):
+        rt.send_recv_persistent(keys[0])
+    for key, buf in zip(keys[1:], recvbufs[1:]):
+        result = rt.send_recv_persistent(key)
+        assert all(r is b for r, b in zip(result, buf))
+        check_received(sources, result, np.double)
+
+    # Using a plan makes it the most recent, so the other one is evicted
+    rt.send_recv_persistent(keys[1])
+    keys[0] = rt.plan(
+        destination=destination, sendbuf=sendbuf, source=sources, recvbuf=recvbufs[0]
+    )
+    assert keys[2] not in rt._plans
+    assert keys[1] in rt._plans
+    check_received(sources, rt.send_recv_persistent(keys[0]), np.double)
+
+#==============================================================================
+
+@pytest.mark.parametrize("dtype, broadcast", data_cases)
+def test_send_recv_alltoallv(monkeypatch, dtype, broadcast):
+
+    # The tests run in communicators small enough to use Alltoallv
+    assert size <= router.small_comm_size
+    rt = Router(comm)
+
+    for offset in [0, 2, 2, 0]:
+        data = get_data(dtype, broadcast, offset)
+        reference = plain_send_recv(monkeypatch, get_destination(), data, dtype)
+
+        result = rt.send_recv(destination=get_destination(), data=data, tag=0)
+        check_received(*result, dtype, offset, broadcast)
+        assert_same(result, reference)
+
+        # The collective method gives the same
+        result = rt.all_to_all(destination=get_destination(), data=data, dtype=dtype)
+        assert_same(result, reference)
+
+#==============================================================================
+
+@pytest.mark.parametrize("dtype, broadcast", data_cases)
+def test_send_recv_iter(monkeypatch, dtype, broadcast):
+
+    rt = Router(comm)
+
+    for offset in [0, 2, 2, 0]:
+        data = get_data(dtype, broadcast, offset)
+        reference = plain_send_recv(monkeypatch, get_destination(), data, dtype)
+
+        # Collect the data in the order it arrives and sort it by source
+        received = {}
+        for source, buf in rt.send_recv_iter(
+            destination=get_destination(), data=data, tag=0
+        ):
+            received[source] = buf
+        sources = sorted(received.keys())
+        assert_same((sources, [received[s] for s in sources]), reference)
+
+#==============================================================================
+
+def node_aware_routers():
+    """Routers with the real nodes and with ranks split into nodes of two"""
+    rt_node = Router(comm, node_aware=True)
+    rt_split = Router(comm, node_aware=True)
+    rt_split._set_node_comm(comm.Split(color=rank // 2, key=rank))
+    return [rt_node, rt_split]
+
+@pytest.mark.parametrize("dtype, broadcast", data_cases)
+def test_send_recv_node_aware(monkeypatch, dtype, broadcast):
+
+    # Data in the same node goes through shared memory, the rest in messages
+    for rt in node_aware_routers():
+        for offset in [0, 2, 2, 0]:
+            data = get_data(dtype, broadcast, offset)
+            reference = plain_send_recv(monkeypatch, get_destination(), data, dtype)
+
+            result = rt.send_recv(destination=get_destination(), data=data, tag=0)
+            check_received(*result, dtype, offset, broadcast)
+            assert_same(result, reference)
+
+#==============================================================================
+
+@pytest.mark.parametrize("dtype, broadcast", data_cases)
+def test_send_recv_changing_counts(monkeypatch, dtype, broadcast):
+
+    # The counts are only reused when they are declared fixed
+    offsets = [0, 0, 2, 2, 0, 0]
+
+    for small_comm_size in [router.small_comm_size, 0]:
+        monkeypatch.setattr(router, "small_comm_size", small_comm_size)
+        routers = [Router(comm)] + node_aware_routers()
+        for rt in routers:
+            for call, offset in enumerate(offsets):
+                fixed_counts = call > 0 and offsets[call - 1] == offset
+                data = get_data(dtype, broadcast, offset)
+
+                result = rt.send_recv(
+                    destination=get_destination(),
+                    data=data,
+                    tag=0,
+                    fixed_counts=fixed_counts,
+                )
+                check_received(*result, dtype, offset, broadcast)
+
+                # The iterator shares the same counts
+                received = dict(
+                    rt.send_recv_iter(
+                        destination=get_destination(),
+                        data=data,
+                        tag=0,
+                        fixed_counts=True,
+                    )
+                )
+                sources = sorted(received.keys())
+                assert_same((sources, [received[s] for s in sources]), result)
+
+#==============================================================================
+
+def test_shared_window_reuse(monkeypatch):
+
+    rt = Router(comm, node_aware=True)
+
+    # The window is created in the first exchange
+    sources, recvbf = rt.send_recv(
+        destination=get_destination(), data=list_data(np.double), tag=0
+    )
+    check_received(sources, recvbf, np.double)
+    win = rt._shared_win
+    win_bytes = rt._shared_win_bytes
+
+    # Smaller messages reuse it
+    sources, recvbf = rt.send_recv(
+        destination=get_destination(), data=list_data(np.int32), tag=0
+    )
+    check_received(sources, recvbf, np.int32)
+    assert rt._shared_win is win
+    assert rt._shared_win_bytes == win_bytes
+
+    # Larger messages make it grow, all ranks in the node agree on the size
+    offset = 100
+    data = list_data(np.double, offset)
+    sources, recvbf = rt.send_recv(destination=get_destination(), data=data, tag=0)
+    check_received(sources, recvbf, np.double, offset)
+    assert_same(
+        (sources, recvbf),
+        plain_send_recv(monkeypatch, get_destination(), data, np.double),
+    )
+    assert rt._shared_win_bytes > win_bytes
+    sizes = rt.node_comm.allgather(rt._shared_win_bytes)
+    assert all(s == sizes[0] for s in sizes)